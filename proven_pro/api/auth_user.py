@@ -88,7 +88,7 @@ def google_auth(request):
                     print(f"Updating existing user with Google ID: {google_id}")
                     user.google_id = google_id
                     user.is_google_user = True
-                    user.save()
+                    user.save(update_fields=['google_id', 'is_google_user'])
             else:
                 # Create new user
                 print(f"Creating new user with email: {email}")
@@ -262,7 +262,7 @@ class RegisterViewSet(viewsets.ViewSet):
             if user.otp == otp:
                 user.is_verified = True
                 user.otp = None
-                user.save()
+                user.save(update_fields=['is_verified', 'otp'])
                 
                 # Generate JWT tokens
                 refresh = RefreshToken.for_user(user)
@@ -334,7 +334,7 @@ class RegisterViewSet(viewsets.ViewSet):
         # Generate OTP
         otp_code = str(random.randint(100000, 999999))
         user.otp = otp_code
-        user.save()
+        user.save(update_fields=['otp'])
         
         print(f"Generated OTP for user {user.email}: {otp_code}")
         
@@ -483,7 +483,7 @@ class PasswordResetConfirmView(APIView):
             # Check if the token is valid
             if default_token_generator.check_token(user, token):
                 user.set_password(new_password)
-                user.save()
+                user.save(update_fields=['password'])
                 return Response({"message": "Password reset successful."})
             else:
                 return Response({"error": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
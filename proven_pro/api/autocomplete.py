@@ -0,0 +1,161 @@
+"""
+Search-box suggestions.
+
+AutocompleteTerm is a prefix index over names, skills and service categories.
+Each term carries the number of profiles using it, kept up to date by diffing
+a user's AutocompleteEntry rows whenever their profile changes, so lookups
+never aggregate over profiles.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import AutocompleteEntry, AutocompleteTerm
+from .search import split_list_field, search_cache_key
+
+MIN_PREFIX_LENGTH = 2
+MAX_KEY_LENGTH = 100
+
+
+def _key(text):
+    return ' '.join(text.lower().split())[:MAX_KEY_LENGTH]
+
+
+def profile_suggestions(user):
+    """
+    The (kind, key, display) suggestions a user contributes.
+    Uses prefetched categories when available.
+    """
+    suggestions = {}
+
+    def add(kind, key, display):
+        if key:
+            suggestions.setdefault((kind, key), display[:MAX_KEY_LENGTH])
+
+    full_name = ' '.join(part for part in (user.first_name, user.last_name) if part)
+    add('name', _key(full_name), full_name)
+    # "smi" should find "John Smith" too
+    if user.first_name and user.last_name:
+        add('name', _key(user.last_name), full_name)
+
+    for text in (user.primary_tools, user.technical_skills):
+        for skill in split_list_field(text):
+            add('skill', _key(skill), skill)
+
+    for category in user.categories.all():
+        for name in split_list_field(category.services_categories):
+            add('category', _key(name), name)
+
+    return suggestions
+
+
+def _adjust_weights(term_ids, delta):
+    if term_ids:
+        AutocompleteTerm.objects.filter(id__in=term_ids).update(weight=F('weight') + delta)
+
+
+def _settle_display(terms, wanted):
+    """
+    Pick the shown spelling of terms that differently-cased profiles share.
+    Whichever spelling sorts first wins ("Python" over "python"), so the
+    result doesn't depend on which profile was indexed first; a spelling
+    left behind by profiles that no longer use the term (weight 0) is replaced.
+    """
+    changed = []
+    for term in terms:
+        display = wanted[(term.kind, term.key)]
+        if term.display != display and (term.weight == 0 or display < term.display):
+            term.display = display
+            changed.append(term)
+    if changed:
+        AutocompleteTerm.objects.bulk_update(changed, ['display'])
+
+
+def update_user_suggestions(user):
+    """
+    Bring one user's contribution to the suggestion index up to date,
+    touching only the terms that were added or removed.
+    """
+    wanted = profile_suggestions(user)
+    current = {
+        (kind, key): term_id
+        for term_id, kind, key in AutocompleteEntry.objects
+        .filter(user_id=user.pk)
+        .values_list('term_id', 'term__kind', 'term__key')
+    }
+
+    removed = [term_id for pair, term_id in current.items() if pair not in wanted]
+    added = [pair for pair in wanted if pair not in current]
+    if not removed and not added:
+        return
+
+    with transaction.atomic():
+        if removed:
+            AutocompleteEntry.objects.filter(user_id=user.pk, term_id__in=removed).delete()
+            _adjust_weights(removed, -1)
+
+        if added:
+            AutocompleteTerm.objects.bulk_create(
+                [AutocompleteTerm(kind=kind, key=key, display=wanted[(kind, key)]) for kind, key in added],
+                ignore_conflicts=True,
+            )
+            lookup = Q()
+            for kind, key in added:
+                lookup |= Q(kind=kind, key=key)
+            terms = list(AutocompleteTerm.objects.filter(lookup).only('id', 'kind', 'key', 'display', 'weight'))
+            _settle_display(terms, wanted)
+            added_ids = [term.id for term in terms]
+            AutocompleteEntry.objects.bulk_create(
+                [AutocompleteEntry(user_id=user.pk, term_id=term_id) for term_id in added_ids],
+                ignore_conflicts=True,
+            )
+            _adjust_weights(added_ids, 1)
+
+
+def remove_user_suggestions(user_id):
+    """
+    Drop a user's contribution, e.g. before the account is deleted.
+    """
+    term_ids = list(AutocompleteEntry.objects.filter(user_id=user_id).values_list('term_id', flat=True))
+    with transaction.atomic():
+        AutocompleteEntry.objects.filter(user_id=user_id).delete()
+        _adjust_weights(term_ids, -1)
+
+
+def suggest(prefix, limit=None):
+    """
+    Top suggestions for a typed prefix, most used first. Results are cached
+    per search generation, so hot prefixes never reach the database twice.
+    """
+    max_results = settings.SEARCH_AUTOCOMPLETE_MAX_RESULTS
+    limit = max(1, min(limit or max_results, max_results))
+    key = _key(prefix or '')
+    if len(key) < MIN_PREFIX_LENGTH:
+        return []
+
+    cache_key = search_cache_key('suggest', {'q': key, 'limit': limit})
+    suggestions = cache.get(cache_key)
+    if suggestions is not None:
+        return suggestions
+
+    # Keys are stored lowercased; istartswith keeps MySQL on the (key, kind) index
+    rows = (
+        AutocompleteTerm.objects
+        .filter(key__istartswith=key, weight__gt=0)
+        .order_by('-weight', 'key')
+        .values_list('kind', 'display')[:limit * 2]
+    )
+    suggestions = []
+    seen = set()
+    for kind, display in rows:
+        # A full name is indexed under both first and last name
+        if (kind, display) in seen:
+            continue
+        seen.add((kind, display))
+        suggestions.append({'text': display, 'type': kind})
+        if len(suggestions) == limit:
+            break
+
+    cache.set(cache_key, suggestions, timeout=settings.SEARCH_RESULTS_CACHE_TIMEOUT)
+    return suggestions
@@ -0,0 +1,204 @@
+"""
+Image derivative pipeline for profile_pic, project_image and certifications_image.
+
+After an upload commits, a worker thread replaces the original with an
+EXIF-stripped copy no larger than IMAGE_MAX_DIMENSION and renders every
+IMAGE_VARIANTS size as JPEG (PNG for images with transparency) and WebP.
+The results are recorded in the row's <field>_variants column:
+
+    {'source': 'user_profiles_pic/me.jpg',
+     'sizes': {'thumb': {'name': ..., 'webp': ..., 'width': 96, 'height': 96}, ...}}
+
+Serializers ask image_url() for the variant that fits their slot and fall
+back to the original until processing has finished.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .storage import release_file
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def processed_variants(instance, field_name):
+    """
+    The recorded variants, or {} when they belong to an older upload.
+    """
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field(field_name)) or {}
+    if not field_file or variants.get('source') != field_file.name:
+        return {}
+    return variants.get('sizes', {})
+
+
+def variant_names(variants):
+    for size in (variants or {}).get('sizes', {}).values():
+        yield size['name']
+        yield size['webp']
+
+
+def release_image_variants(instance, field_name):
+    """
+    Release the variant files recorded on a deleted row.
+    """
+    storage = instance._meta.get_field(field_name).storage
+    for name in variant_names(instance.__dict__.get(variants_field(field_name))):
+        release_file(storage, name)
+
+
+def image_url(instance, field_name, variant=None):
+    """
+    URL of a variant of an image field, or of the original while there is none.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+    sizes = processed_variants(instance, field_name)
+    if variant in sizes:
+        return field_file.storage.url(sizes[variant]['name'])
+    return field_file.url
+
+
+def image_variant_urls(instance, field_name):
+    """
+    {variant: {url, webp_url, width, height}} for srcset-style selection by clients.
+    """
+    field_file = getattr(instance, field_name)
+    return {
+        name: {
+            'url': field_file.storage.url(variant['name']),
+            'webp_url': field_file.storage.url(variant['webp']),
+            'width': variant['width'],
+            'height': variant['height'],
+        }
+        for name, variant in processed_variants(instance, field_name).items()
+    }
+
+
+def image_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix='images')
+    return _executor
+
+
+def schedule_image_processing(instance, field_name, update_fields=None):
+    """
+    Queue derivative generation for an image field that changed in this save.
+    Runs after commit, so the upload request doesn't wait for it.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    field_file = getattr(instance, field_name)
+    if not field_file or (getattr(instance, variants_field(field_name)) or {}).get('source') == field_file.name:
+        return
+
+    model, pk = type(instance), instance.pk
+    if settings.IMAGE_PIPELINE_WORKERS:
+        transaction.on_commit(lambda: image_executor().submit(_process_in_worker, model, pk, field_name))
+    else:
+        transaction.on_commit(lambda: process_image(model, pk, field_name))
+
+
+def _process_in_worker(model, pk, field_name):
+    try:
+        process_image(model, pk, field_name)
+    except Exception:
+        logger.exception(f"Image processing failed for {model.__name__} {pk} {field_name}")
+    finally:
+        # Worker threads get their own DB connections; don't leak them
+        connections.close_all()
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, optimize=True, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _resize(image, size, crop):
+    if crop:
+        return ImageOps.fit(image, (size, size), Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.LANCZOS)
+    return resized
+
+
+def process_image(model, pk, field_name):
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    source = field_file.name
+    if not source or (getattr(instance, variants_field(field_name)) or {}).get('source') == source:
+        return
+
+    storage = field_file.storage
+    previous_variants = getattr(instance, variants_field(field_name))
+    with storage.open(source, 'rb') as upload:
+        image = Image.open(upload)
+        image.load()
+
+    # Bake the EXIF orientation into the pixels, then drop all metadata
+    image = ImageOps.exif_transpose(image)
+    transparent = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if transparent else 'RGB')
+    image.info.clear()
+    image_format, extension = ('PNG', 'png') if transparent else ('JPEG', 'jpg')
+    options = {} if transparent else {'quality': settings.IMAGE_JPEG_QUALITY}
+
+    stem = os.path.splitext(source)[0]
+    written = []
+
+    def save(name, derivative, derivative_format, **derivative_options):
+        name = storage.save(name, _encode(derivative, derivative_format, **derivative_options))
+        written.append(name)
+        return name
+
+    original = _resize(image, settings.IMAGE_MAX_DIMENSION, crop=False)
+    original_name = save(f'{stem}.{extension}', original, image_format, **options)
+
+    sizes = {}
+    for variant, spec in settings.IMAGE_VARIANTS.items():
+        resized = _resize(original, spec['size'], spec['crop'])
+        sizes[variant] = {
+            'name': save(f'{stem}_{variant}.{extension}', resized, image_format, **options),
+            'webp': save(f'{stem}_{variant}.webp', resized, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY),
+            'width': resized.width,
+            'height': resized.height,
+        }
+
+    # Only swap in the results if nobody uploaded a newer image meanwhile
+    updated = model.objects.filter(pk=pk, **{field_name: source}).update(**{
+        field_name: original_name,
+        variants_field(field_name): {'source': original_name, 'sizes': sizes},
+    })
+    if not updated:
+        for name in written:
+            storage.delete(name)
+        return
+    # Content-addressed storage hands an identical re-encode the same name,
+    # but that save still took a reference of its own
+    if original_name != source or getattr(storage, 'reference_counted', False):
+        storage.delete(source)
+    for name in variant_names(previous_variants):
+        release_file(storage, name)
+
+    # A queryset update sends no signals; refresh what shows these URLs
+    # (version, cached and edge-cached profiles, search results)
+    from .signals import PendingProfileChanges
+    user_id = pk if field_name == 'profile_pic' else instance.user_id
+    PendingProfileChanges.current().add(user_id, bump_version=True)
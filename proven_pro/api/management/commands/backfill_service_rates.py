@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.models import ServiceCategory
+from api.search import save_search_documents, bump_search_generation, DOCUMENT_PREFETCH
+
+Users = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Parse ServiceCategory.rate_range into rate_min/rate_max/rate_currency/rate_unit in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        processed = 0
+        parsed = 0
+        last_pk = 0
+
+        while True:
+            batch = list(
+                ServiceCategory.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'user_id', 'rate_range')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for category in batch:
+                category.parse_rate()
+                if category.rate_min is not None:
+                    parsed += 1
+            ServiceCategory.objects.bulk_update(batch, ServiceCategory.RATE_FIELDS)
+
+            # Refresh the search documents that carry the per-user rate columns
+            users = Users.objects.filter(pk__in={category.user_id for category in batch})
+            save_search_documents(users.prefetch_related(*DOCUMENT_PREFETCH))
+
+            processed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Processed {processed} service categories")
+
+        bump_search_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled rates for {processed} service categories ({parsed} with a parseable rate)"
+        ))
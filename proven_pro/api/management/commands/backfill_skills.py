@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import UserSkill
+from api.search import bump_search_generation
+from api.skills import parse_skills, ensure_skills, SKILL_SOURCE_FIELDS
+
+Users = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Build the Skill/UserSkill taxonomy from primary_tools and technical_skills in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        processed = 0
+        last_pk = None
+
+        while True:
+            users = Users.objects.order_by('pk').only('pk', *SKILL_SOURCE_FIELDS)
+            if last_pk is not None:
+                users = users.filter(pk__gt=last_pk)
+            batch = list(users[:batch_size])
+            if not batch:
+                break
+
+            parsed = {user.pk: parse_skills(user) for user in batch}
+            all_skills = {}
+            for skills in parsed.values():
+                all_skills.update(skills)
+            skill_ids = ensure_skills(all_skills)
+
+            with transaction.atomic():
+                UserSkill.objects.filter(user__in=[user.pk for user in batch]).delete()
+                UserSkill.objects.bulk_create(
+                    [
+                        UserSkill(user_id=user_id, skill_id=skill_ids[key])
+                        for user_id, skills in parsed.items()
+                        for key in skills
+                    ],
+                    batch_size=1000,
+                )
+
+            processed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Processed {processed} users")
+
+        bump_search_generation()
+        self.stdout.write(self.style.SUCCESS(f"Skills backfilled for {processed} users"))
@@ -0,0 +1,133 @@
+import datetime
+import io
+import timeit
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.profiles import owner_profile_prefetches
+from api.serializers import UserProfileSerializer
+
+Users = get_user_model()
+
+
+def sample_profile(rows):
+    """
+    An owner profile shaped like UserProfileSerializer output, with raw UUID,
+    datetime and Decimal values mixed in, and `rows` entries per relation.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        'id': uuid.uuid4(),
+        'username': 'jdelacruz',
+        'email': 'juan@example.com',
+        'subscription_type': 'premium',
+        'subscription_active': True,
+        'subscription_start_date': now,
+        'subscription_end_date': now + datetime.timedelta(days=30),
+        'first_name': 'Juan',
+        'last_name': 'Dela Cruz',
+        'bio': 'Full-stack developer and virtual assistant. ' * 20,
+        'profile_pic_url': '/media/profile_pics/juan.jpg',
+        'rating': 4.8,
+        'review_summary': {'count': 132, 'average': 4.8},
+        'profile_url': 'a1b2c3d4',
+        'primary_tools': 'Python, Django, React, PostgreSQL, Figma',
+        'technical_skills': 'REST APIs, data pipelines, automation',
+        'soft_skills': 'Communication, ownership',
+        'verification_status': 75,
+        'social_links': [
+            {'id': index, 'platform': 'linkedin', 'url': f'https://linkedin.com/in/juan{index}'}
+            for index in range(min(rows, 6))
+        ],
+        'experiences': [
+            {
+                'id': index, 'company_name': f'Company {index}', 'position': 'Senior Developer',
+                'key_responsibilities': 'Built and maintained customer-facing services. ' * 5,
+                'experience_start_date': datetime.date(2015 + index % 8, 1, 1),
+                'experience_end_date': datetime.date(2016 + index % 8, 1, 1),
+            }
+            for index in range(rows)
+        ],
+        'certifications': [
+            {
+                'id': index, 'certifications_name': f'Certification {index}', 'certifications_issuer': 'Issuer',
+                'certifications_issued_date': datetime.date(2020, 1, 1), 'certifications_expiration_date': None,
+                'certifications_id': str(uuid.uuid4()), 'certifications_image_url': None,
+            }
+            for index in range(rows)
+        ],
+        'categories': [
+            {
+                'id': index, 'services_categories': 'Web Development', 'services_description': 'Django apps',
+                'rate_range': '$20-$40/hr', 'availability': 'Full-time',
+                'rate_min': Decimal('20.00'), 'rate_max': Decimal('40.00'),
+            }
+            for index in range(rows)
+        ],
+        'projects': [
+            {
+                'id': index, 'project_title': f'Project {index}',
+                'project_description': 'Marketplace with search and payments. ' * 5,
+                'project_url': f'https://example.com/{index}', 'updated_at': now,
+            }
+            for index in range(rows)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare the orjson renderer/parser with DRF's stock JSON on a profile payload"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20, help="Rows per relation in the sample profile")
+        parser.add_argument('--profile-url', help="Benchmark a real user's owner profile instead")
+        parser.add_argument('--number', type=int, default=2000, help="Iterations per measurement")
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson is not installed; ORJSONRenderer would fall back to JSONRenderer")
+
+        if options['profile_url']:
+            user = Users.objects.filter(profile_url=options['profile_url']).prefetch_related(
+                *owner_profile_prefetches()
+            ).first()
+            if user is None:
+                raise CommandError(f"No user with profile_url {options['profile_url']}")
+            data = UserProfileSerializer(user).data
+        else:
+            data = sample_profile(options['rows'])
+
+        number = options['number']
+        stock_renderer, fast_renderer = JSONRenderer(), renderers.ORJSONRenderer()
+        body = stock_renderer.render(data)
+        self.stdout.write(f"Payload: {len(body)} bytes, {number} iterations")
+
+        self._compare(
+            'render',
+            lambda: stock_renderer.render(data),
+            lambda: fast_renderer.render(data),
+            number,
+        )
+        stock_parser, fast_parser = JSONParser(), renderers.ORJSONParser()
+        self._compare(
+            'parse',
+            lambda: stock_parser.parse(io.BytesIO(body)),
+            lambda: fast_parser.parse(io.BytesIO(body)),
+            number,
+        )
+
+    def _compare(self, label, stock, fast, number):
+        stock_seconds = min(timeit.repeat(stock, number=number, repeat=3))
+        fast_seconds = min(timeit.repeat(fast, number=number, repeat=3))
+        self.stdout.write(
+            f"{label:>6}: stock {stock_seconds / number * 1e6:8.1f} µs  "
+            f"orjson {fast_seconds / number * 1e6:8.1f} µs  "
+            f"({stock_seconds / fast_seconds:.1f}x)"
+        )
+
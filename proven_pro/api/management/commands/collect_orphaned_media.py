@@ -0,0 +1,286 @@
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.images import variant_names, variants_field
+from api.models import ChunkedUpload, MediaBlob
+from api.storage import file_fields, is_content_addressed
+
+REFERENCE_CHUNK_SIZE = 2000
+
+
+class ReferenceIndex:
+    """
+    Every media name the database refers to, in a temporary on-disk SQLite
+    table, so memory use doesn't grow with the number of files.
+    """
+    def __init__(self):
+        self.file = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        self.db = sqlite3.connect(self.file.name)
+        self.db.execute('CREATE TABLE refs (name TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def build(self):
+        for model in apps.get_models():
+            fields = file_fields(model)
+            if not fields:
+                continue
+            concrete = {field.name for field in model._meta.concrete_fields}
+            columns = [field.attname for field in fields]
+            variant_columns = [
+                variants_field(field.name) for field in fields if variants_field(field.name) in concrete
+            ]
+
+            rows = model._base_manager.values_list(*columns, *variant_columns)
+            names = []
+            for row in rows.iterator(chunk_size=REFERENCE_CHUNK_SIZE):
+                names.extend(name for name in row[:len(columns)] if name)
+                for variants in row[len(columns):]:
+                    names.extend(variant_names(variants))
+                if len(names) >= REFERENCE_CHUNK_SIZE:
+                    self.add(names)
+                    names = []
+            self.add(names)
+        self.db.commit()
+
+    def add(self, names):
+        self.db.executemany('INSERT OR IGNORE INTO refs VALUES (?)', ((name,) for name in names))
+
+    def referenced(self, names):
+        found = set()
+        names = list(names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            query = f"SELECT name FROM refs WHERE name IN ({', '.join('?' * len(chunk))})"
+            found.update(name for name, in self.db.execute(query, chunk))
+        return found
+
+    def close(self):
+        self.db.close()
+        self.file.close()
+
+
+def walk_media(root, skip, after=None, prefix=()):
+    """
+    Yield (name, size, mtime) for files under `root` in sorted path order,
+    starting after the path parts `after`. Paths in `skip` are left out.
+    """
+    try:
+        entries = sorted(os.scandir(os.path.join(root, *prefix)), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        parts = prefix + (entry.name,)
+        if after is not None and parts < after[:len(parts)]:
+            continue
+        if os.path.normpath(entry.path) in skip:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_media(root, skip, after, parts)
+        elif entry.is_file(follow_symlinks=False):
+            if after is not None and parts <= after:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            yield '/'.join(parts), stat.st_size, stat.st_mtime
+
+
+def human_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+class Command(BaseCommand):
+    help = "Remove or quarantine media files no row refers to any more, in resumable batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace-days', type=float, default=settings.MEDIA_GC_GRACE_DAYS,
+            help="Leave files modified more recently than this alone",
+        )
+        parser.add_argument(
+            '--quarantine', action='store_true', help="Move orphans to MEDIA_QUARANTINE_ROOT instead of deleting them",
+        )
+        parser.add_argument(
+            '--purge-quarantine', action='store_true', help="Also delete quarantined files older than the grace period",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of an interrupted run")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.quarantine = options['quarantine']
+        self.started = timezone.now()
+        self.grace = datetime.timedelta(days=options['grace_days'])
+        self.cutoff = time.time() - self.grace.total_seconds()
+
+        # Dry runs neither use nor leave a checkpoint
+        checkpoint = None if options['restart'] or self.dry_run else self._load_checkpoint()
+        self.stats = checkpoint['stats'] if checkpoint else {
+            'scanned': 0, 'scanned_bytes': 0, 'orphans': 0, 'reclaimed_bytes': 0, 'by_directory': {},
+        }
+        after = tuple(checkpoint['after'].split('/')) if checkpoint else None
+        if after:
+            self.stdout.write(f"Resuming after {checkpoint['after']}")
+
+        self._expire_chunked_uploads()
+
+        self.stdout.write("Indexing file references...")
+        references = ReferenceIndex()
+        try:
+            references.build()
+            skip = {
+                os.path.normpath(path) for path in (
+                    settings.CHUNKED_UPLOAD_ROOT, settings.MEDIA_QUARANTINE_ROOT,
+                    settings.MEDIA_GC_CHECKPOINT, f'{settings.MEDIA_GC_CHECKPOINT}.tmp',
+                )
+            }
+            batch = []
+            for media_file in walk_media(settings.MEDIA_ROOT, skip, after):
+                batch.append(media_file)
+                if len(batch) >= options['batch_size']:
+                    self._collect(batch, references)
+                    batch = []
+            if batch:
+                self._collect(batch, references)
+        finally:
+            references.close()
+
+        if options['purge_quarantine'] and not self.dry_run:
+            self._purge_quarantine()
+        if not self.dry_run:
+            self._clear_checkpoint()
+        self._report()
+
+    def _collect(self, batch, references):
+        self.stats['scanned'] += len(batch)
+        self.stats['scanned_bytes'] += sum(size for _, size, _ in batch)
+
+        candidates = {name: size for name, size, mtime in batch if mtime < self.cutoff}
+        orphans = set(candidates) - references.referenced(candidates)
+        # Blobs reused since the references were indexed (their rows are touched on reuse)
+        blob_names = [name for name in orphans if is_content_addressed(name)]
+        orphans -= set(
+            MediaBlob.objects.filter(name__in=blob_names, updated_at__gte=self.started).values_list('name', flat=True)
+        )
+
+        removed = []
+        for name in sorted(orphans):
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not self.dry_run:
+                try:
+                    if os.stat(path).st_mtime >= self.cutoff:
+                        continue  # touched while we were looking
+                    self._remove(name, path)
+                except FileNotFoundError:
+                    continue
+            removed.append(name)
+            directory = name.split('/')[0] if '/' in name else '.'
+            self.stats['orphans'] += 1
+            self.stats['reclaimed_bytes'] += candidates[name]
+            self.stats['by_directory'][directory] = self.stats['by_directory'].get(directory, 0) + candidates[name]
+
+        if not self.dry_run:
+            MediaBlob.objects.filter(name__in=[name for name in removed if is_content_addressed(name)]).delete()
+            for directory in {os.path.dirname(os.path.join(settings.MEDIA_ROOT, name)) for name in removed}:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass  # not empty
+            self._save_checkpoint(batch[-1][0])
+        self.stdout.write(f"Scanned {self.stats['scanned']} files, {self.stats['orphans']} orphaned")
+
+    def _remove(self, name, path):
+        if not self.quarantine:
+            os.remove(path)
+            return
+        target = os.path.join(settings.MEDIA_QUARANTINE_ROOT, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+        # The grace period for purging counts from the move
+        os.utime(target)
+
+    def _purge_quarantine(self):
+        purged = purged_bytes = 0
+        for name, size, mtime in walk_media(settings.MEDIA_QUARANTINE_ROOT, set()):
+            if mtime < self.cutoff:
+                os.remove(os.path.join(settings.MEDIA_QUARANTINE_ROOT, name))
+                purged += 1
+                purged_bytes += size
+        self.stdout.write(f"Purged {purged} quarantined files ({human_size(purged_bytes)})")
+
+    def _expire_chunked_uploads(self):
+        """
+        Drop resumable uploads nobody has touched within the grace period, and
+        part files whose upload no longer exists.
+        """
+        stale = ChunkedUpload.objects.filter(status='uploading', updated_at__lt=self.started - self.grace)
+        expired = 0
+        for upload_id in stale.values_list('pk', flat=True).iterator(chunk_size=REFERENCE_CHUNK_SIZE):
+            part = os.path.join(settings.CHUNKED_UPLOAD_ROOT, f'{upload_id}.part')
+            if not self.dry_run:
+                try:
+                    os.remove(part)
+                except FileNotFoundError:
+                    pass
+            expired += 1
+        if not self.dry_run:
+            stale.delete()
+
+        try:
+            parts = list(os.scandir(settings.CHUNKED_UPLOAD_ROOT))
+        except FileNotFoundError:
+            parts = []
+        for part in parts:
+            try:
+                upload_id = uuid.UUID(part.name[:-len('.part')])
+            except ValueError:
+                continue
+            if (
+                part.name.endswith('.part') and part.stat().st_mtime < self.cutoff
+                and not ChunkedUpload.objects.filter(pk=upload_id).exists()
+            ):
+                if not self.dry_run:
+                    os.remove(part.path)
+                expired += 1
+        self.stdout.write(f"Expired {expired} abandoned chunked uploads")
+
+    def _load_checkpoint(self):
+        try:
+            with open(settings.MEDIA_GC_CHECKPOINT) as checkpoint:
+                return json.load(checkpoint)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_checkpoint(self, after):
+        temporary = f'{settings.MEDIA_GC_CHECKPOINT}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump({'after': after, 'stats': self.stats}, checkpoint)
+        os.replace(temporary, settings.MEDIA_GC_CHECKPOINT)
+
+    def _clear_checkpoint(self):
+        try:
+            os.remove(settings.MEDIA_GC_CHECKPOINT)
+        except FileNotFoundError:
+            pass
+
+    def _report(self):
+        stats = self.stats
+        verb = 'would be reclaimed' if self.dry_run else ('quarantined' if self.quarantine else 'reclaimed')
+        self.stdout.write(f"Scanned {stats['scanned']} files ({human_size(stats['scanned_bytes'])})")
+        for directory, size in sorted(stats['by_directory'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {directory}: {human_size(size)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['orphans']} orphaned files, {human_size(stats['reclaimed_bytes'])} {verb}"
+        ))
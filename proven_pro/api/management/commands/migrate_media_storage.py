@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from api.images import variants_field
+from api.models import Certification, MediaBlob, Project
+from api.search import bump_search_generation
+from api.signals import PendingProfileChanges
+from api.storage import file_fields, is_content_addressed
+
+Users = get_user_model()
+
+MEDIA_MODELS = (Users, Project, Certification)
+
+
+class Command(BaseCommand):
+    help = "Move existing media files into the content-addressed layout, storing identical files once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be migrated")
+        parser.add_argument('--keep-originals', action='store_true', help="Leave the old files in place")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.keep_originals = options['keep_originals']
+        self.files = self.bytes = self.missing = 0
+
+        for model in MEDIA_MODELS:
+            for field in file_fields(model):
+                if not getattr(field.storage, 'reference_counted', False):
+                    raise CommandError(
+                        f"{model.__name__}.{field.name} doesn't use ContentAddressedStorage; check STORAGES"
+                    )
+
+        for model in MEDIA_MODELS:
+            rows = self._migrate_model(model, options['batch_size'])
+            verb = 'would be migrated' if self.dry_run else 'migrated'
+            self.stdout.write(f"{model.__name__}: {rows} rows {verb}")
+
+        verb = 'would be copied' if self.dry_run else 'copied'
+        self.stdout.write(f"{self.files} files ({self.bytes / 2 ** 20:.1f} MiB) {verb}, {self.missing} missing")
+        if not self.dry_run:
+            bump_search_generation()
+            blobs = MediaBlob.objects.aggregate(count=Count('pk'), size=Sum('size'))
+            self.stdout.write(self.style.SUCCESS(
+                f"Media now stored as {blobs['count']} blobs ({(blobs['size'] or 0) / 2 ** 20:.1f} MiB)"
+            ))
+
+    def _migrate_model(self, model, batch_size):
+        fields = file_fields(model)
+        variant_columns = {
+            field.attname: variants_field(field.name) for field in fields
+            if any(other.name == variants_field(field.name) for other in model._meta.concrete_fields)
+        }
+        columns = ['pk', *[field.attname for field in fields], *variant_columns.values()]
+        if model is not Users:
+            columns.append('user_id')
+
+        has_media = Q()
+        for field in fields:
+            has_media |= Q(**{f'{field.attname}__gt': ''})
+
+        migrated = 0
+        last_pk = None
+        while True:
+            rows = model._base_manager.filter(has_media).order_by('pk').values(*columns)
+            if last_pk is not None:
+                rows = rows.filter(pk__gt=last_pk)
+            batch = list(rows[:batch_size])
+            if not batch:
+                break
+
+            for row in batch:
+                if self._migrate_row(model, row, fields, variant_columns):
+                    migrated += 1
+            last_pk = batch[-1]['pk']
+        return migrated
+
+    def _migrate_row(self, model, row, fields, variant_columns):
+        storage = fields[0].storage
+        legacy = [
+            field.attname for field in fields
+            if row[field.attname] and not is_content_addressed(row[field.attname])
+        ]
+        if not legacy:
+            return False
+
+        with transaction.atomic():
+            updates, copied = {}, []
+            for attname in legacy:
+                name = row[attname]
+                new_name = self._copy(storage, name, copied)
+                if new_name is None:
+                    continue
+                updates[attname] = new_name
+
+                variants = row.get(variant_columns.get(attname)) or {}
+                if variants.get('source') == name:
+                    # Variants of the current file move along with it; older
+                    # ones are left for the orphaned-media collector
+                    sizes = {}
+                    for variant, size in variants.get('sizes', {}).items():
+                        image_name = self._copy(storage, size['name'], copied)
+                        webp_name = self._copy(storage, size['webp'], copied)
+                        if image_name and webp_name:
+                            sizes[variant] = {**size, 'name': image_name, 'webp': webp_name}
+                    updates[variant_columns[attname]] = {'source': new_name, 'sizes': sizes}
+
+            if not updates:
+                return False
+            if self.dry_run:
+                # Counted as a row that would be repointed
+                return True
+
+            # Leave the row alone if a new upload replaced a file meanwhile
+            unchanged = {attname: row[attname] for attname in legacy}
+            if not model._base_manager.filter(pk=row['pk'], **unchanged).update(**updates):
+                for _, new_name in copied:
+                    storage.delete(new_name)
+                return False
+
+            user_id = row['pk'] if model is Users else row['user_id']
+            PendingProfileChanges.current().add(user_id, bump_version=True)
+            if not self.keep_originals:
+                originals = {name for name, _ in copied}
+                transaction.on_commit(lambda: [storage.delete(name) for name in originals])
+        return True
+
+    def _copy(self, storage, name, copied):
+        """
+        Store an existing file content-addressed and return its new name;
+        (old, new) pairs are appended to `copied`.
+        """
+        if not storage.exists(name):
+            self.missing += 1
+            self.stderr.write(f"Missing file: {name}")
+            return None
+        self.files += 1
+        self.bytes += storage.size(name)
+        if self.dry_run:
+            return name
+        with storage.open(name, 'rb') as original:
+            new_name = storage.save(name, original)
+        copied.append((name, new_name))
+        return new_name
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from api.models import Review
+from api.search import save_search_documents, bump_search_generation, DOCUMENT_PREFETCH
+from api.signals import PendingProfileChanges
+
+Users = get_user_model()
+
+
+def backfill_profile_stats(users):
+    """
+    Store the derived profile fields that are out of date: verification_percentage
+    (only recomputed by Users.save) and the review summary (only refreshed when a
+    review is written), so rows that predate them stop reading 0. Their cached
+    profiles are dropped once the batch commits. Returns how many were fixed.
+    """
+    stats = {
+        row['user']: row for row in
+        Review.objects.filter(user__in=users).values('user').annotate(average=Avg('rating'), count=Count('id'))
+    }
+    stale = []
+    for user in users:
+        review_stats = stats.get(user.pk, {'average': None, 'count': 0})
+        fields = {
+            'verification_percentage': user.compute_verification_percentage(),
+            'rating': review_stats['average'] or 0,
+            'review_count': review_stats['count'],
+        }
+        if any(getattr(user, field) != value for field, value in fields.items()):
+            for field, value in fields.items():
+                setattr(user, field, value)
+            stale.append(user)
+    Users.objects.bulk_update(stale, ['verification_percentage', 'rating', 'review_count'])
+    pending = PendingProfileChanges.current()
+    for user in stale:
+        pending.add(user.pk, bump_version=True)
+    return len(stale)
+
+
+class Command(BaseCommand):
+    help = "Rebuild ProfileSearchDocument rows for all users in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rebuilt = fixed = 0
+        last_pk = None
+
+        while True:
+            users = Users.objects.order_by('pk').prefetch_related(*DOCUMENT_PREFETCH)
+            if last_pk is not None:
+                users = users.filter(pk__gt=last_pk)
+            batch = list(users[:batch_size])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                fixed += backfill_profile_stats(batch)
+                save_search_documents(batch)
+            rebuilt += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Rebuilt {rebuilt} search documents")
+
+        bump_search_generation()
+        self.stdout.write(f"Recomputed verification and review stats for {fixed} profiles")
+        self.stdout.write(self.style.SUCCESS(f"Search documents rebuilt for {rebuilt} profiles"))
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from api.autocomplete import update_user_suggestions
+from api.models import AutocompleteTerm
+from api.search import index_users, bump_search_generation, CORPUS_STATS_CACHE_KEY
+
+Users = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the profile search index and search suggestions in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        indexed = 0
+        last_pk = None
+
+        # Keyset iteration over the primary key keeps every batch query cheap
+        while True:
+            users = Users.objects.order_by('pk').prefetch_related('categories', 'experiences')
+            if last_pk is not None:
+                users = users.filter(pk__gt=last_pk)
+            batch = list(users[:batch_size])
+            if not batch:
+                break
+
+            index_users(batch)
+            for user in batch:
+                update_user_suggestions(user)
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Indexed {indexed} profiles")
+
+        AutocompleteTerm.objects.filter(weight=0).delete()
+        cache.delete(CORPUS_STATS_CACHE_KEY)
+        bump_search_generation()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt for {indexed} profiles"))
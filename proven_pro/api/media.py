@@ -0,0 +1,188 @@
+"""
+Serves MEDIA_ROOT with HTTP Range and conditional request support.
+
+    GET /media/<path>      200, or 206 Partial Content for `Range: bytes=...`
+
+Video players scrub by asking for byte ranges; answering those with 206
+instead of the whole file means seeking in video_intro only transfers what
+is played. Full responses go through FileResponse, which hands the open file
+to the server's wsgi.file_wrapper (sendfile under gunicorn). With
+MEDIA_ACCEL_REDIRECT_PREFIX set, Django only checks access and a fronting
+nginx sends the file, ranges included, from an `internal` location.
+
+Part files of unfinished uploads are never served, and MEDIA_STAFF_ONLY_PREFIXES
+(verification documents) are only served to staff. Only the image and video
+types in INLINE_CONTENT_TYPES are displayed in the browser; anything else is
+sent as a download, so an uploaded .html or .svg can't run on this origin.
+With MEDIA_ACCEL_REDIRECT_PREFIX, nginx keeps Content-Disposition but the
+internal location has to add `X-Content-Type-Options: nosniff` itself.
+"""
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+READ_BLOCK_SIZE = 64 * 1024
+
+# What the site's own uploads are; these are safe to render inline
+INLINE_CONTENT_TYPES = {
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'video/mp4', 'video/quicktime', 'video/webm',
+}
+
+
+class FileRange:
+    """
+    File-like view of `length` bytes of an open file starting at `start`.
+    It has no fileno(), so servers stream it with read() instead of
+    sendfile()-ing to the end of the file.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to ignore the
+    header (malformed, or several ranges), or () when it can't be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return ()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return ()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    A Range only applies while If-Range (if sent) still names this version of the file.
+    """
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def set_content_headers(response, name, content_type):
+    """
+    Keep browsers from rendering anything but the allowed image/video types.
+    Content-Disposition is always set here, replacing the inline one
+    FileResponse adds by itself, so every response path says the same.
+    """
+    response['X-Content-Type-Options'] = 'nosniff'
+    as_attachment = content_type not in INLINE_CONTENT_TYPES
+    response['Content-Disposition'] = content_disposition_header(as_attachment, posixpath.basename(name))
+    return response
+
+
+def media_path(request, path):
+    """
+    Absolute path of a servable media file, or Http404.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    chunked_root = os.path.relpath(settings.CHUNKED_UPLOAD_ROOT, settings.MEDIA_ROOT).replace(os.sep, '/')
+    if name == chunked_root or name.startswith(f'{chunked_root}/'):
+        raise Http404
+    if any(part.startswith('.') for part in name.split('/')):
+        # Hidden files, e.g. uploads still being staged by the storage backend
+        raise Http404
+    if name.startswith(tuple(settings.MEDIA_STAFF_ONLY_PREFIXES)) and not request.user.is_staff:
+        raise Http404
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return name, full_path
+
+
+@require_safe
+def serve_media(request, path):
+    name, full_path = media_path(request, path)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    if name.startswith(tuple(settings.MEDIA_STAFF_ONLY_PREFIXES)):
+        cache_control = 'private, no-store'
+    else:
+        cache_control = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the internal location itself, with its own Range/ETag handling
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name)
+        response['Cache-Control'] = cache_control
+        return set_content_headers(response, name, content_type)
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if request.headers.get('Range') and if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.headers['Range'], size)
+
+        if byte_range == ():
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(open(full_path, 'rb'), start, end - start + 1),
+                status=206, content_type=content_type,
+            )
+            response.block_size = READ_BLOCK_SIZE
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response.block_size = READ_BLOCK_SIZE
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return set_content_headers(response, name, content_type)
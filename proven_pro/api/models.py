@@ -8,7 +8,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Avg
+from django.db.models import Avg, Count
 from django.core.cache import cache
 
 
@@ -28,6 +28,10 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 
+def version_timestamp(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
 class Users(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
@@ -51,7 +55,10 @@ class Users(AbstractUser):
     bio = models.TextField(blank=True)
     profile_mail = models.EmailField(unique=True, blank=True, null=True)
     profile_pic = models.ImageField(upload_to='user_profiles_pic/', null=True, blank=True)
+    # Derivatives written by api/images.py: {'source': <processed file>, 'sizes': {...}}
+    profile_pic_variants = models.JSONField(default=dict, blank=True)
     rating = models.FloatField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
 
     mobile = models.CharField(max_length=20, blank=True)
 
@@ -72,8 +79,23 @@ class Users(AbstractUser):
     mobile_verified = models.BooleanField(default=False)
     verification_percentage = models.IntegerField(default=0)
 
-    @property
-    def verification_status(self):
+    # Bumped on every profile-visible write to the user or its related rows;
+    # backs the ETag / Last-Modified headers of profile responses. Versions are
+    # at least the write time in microseconds, so a save from a stale instance
+    # can never move the version back to one a client has already seen.
+    profile_version = models.BigIntegerField(default=0)
+    profile_updated_at = models.DateTimeField(null=True, blank=True)
+
+    # Columns that never appear in a profile representation or search result;
+    # saving only these skips the version bump, reindex and cache drops
+    NON_PROFILE_FIELDS = {
+        'last_login', 'password', 'otp', 'reset_token', 'token_created_at', 'is_verified',
+        'google_id', 'is_google_user',
+    }
+
+    VERIFICATION_FIELDS = {'gov_id_verified', 'address_verified', 'mobile_verified'}
+
+    def compute_verification_percentage(self):
         percentage = 0
         if self.gov_id_verified:
             percentage += 50
@@ -81,6 +103,20 @@ class Users(AbstractUser):
             percentage += 25
         if self.mobile_verified:
             percentage += 25
+        return percentage
+
+    def refresh_review_stats(self):
+        """
+        Recompute the review summary (average rating, count) shown on the profile.
+        """
+        stats = self.client_reviews.aggregate(average=Avg('rating'), count=Count('id'))
+        self.rating = stats['average'] or 0
+        self.review_count = stats['count']
+        self.save(update_fields=['rating', 'review_count'])
+
+    @property
+    def verification_status(self):
+        percentage = self.compute_verification_percentage()
         cache.set(f'{self.id}_verification_percentage', percentage, timeout=60 * 5)
         return percentage
 
@@ -90,6 +126,19 @@ class Users(AbstractUser):
     def save(self, *args, **kwargs):
         if not self.profile_url:
             self.profile_url = str(uuid.uuid4())[:8]
+
+        # Keep the stored percentage in sync so it can be filtered and faceted in SQL
+        self.verification_percentage = self.compute_verification_percentage()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.VERIFICATION_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = update_fields = set(update_fields) | {'verification_percentage'}
+
+        if update_fields is None or not set(update_fields) <= self.NON_PROFILE_FIELDS:
+            self.profile_updated_at = timezone.now()
+            self.profile_version = max(self.profile_version + 1, version_timestamp(self.profile_updated_at))
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'profile_version', 'profile_updated_at'}
+
         super().save(*args, **kwargs)
 
     def generate_share_link(self, recipient_email, expires_in_days=7):
@@ -133,6 +182,9 @@ The Proven Pro Team
             models.Index(fields=['email']),
             models.Index(fields=['subscription_start_date']),
             models.Index(fields=['profile_url']),
+            # Keyset pagination for search sort_by=rating / sort_by=first_name
+            models.Index(fields=['rating', 'id']),
+            models.Index(fields=['first_name', 'id']),
         ]
 
 # Proxy model for pending users
@@ -159,6 +211,7 @@ class Certification(models.Model):
     certifications_expiration_date = models.DateField(null=True, blank=True)
     certifications_id = models.TextField(blank=True)
     certifications_image =models.ImageField(upload_to='certifications_images/', null=True, blank=True)
+    certifications_image_variants = models.JSONField(default=dict, blank=True)
     certifications_image_url = models.URLField(blank=True, null=True)
 
 
@@ -169,6 +222,31 @@ class ServiceCategory(models.Model):
     rate_range = models.CharField(max_length=100, blank=True)
     availability = models.TextField(blank=True)
 
+    # Parsed from rate_range on save so rates can be filtered and sorted in SQL
+    rate_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    rate_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    rate_currency = models.CharField(max_length=3, blank=True)
+    rate_unit = models.CharField(max_length=10, blank=True)
+
+    RATE_FIELDS = ['rate_min', 'rate_max', 'rate_currency', 'rate_unit']
+
+    def parse_rate(self):
+        from .rates import parse_rate_range
+        self.rate_min, self.rate_max, self.rate_currency, self.rate_unit = parse_rate_range(self.rate_range)
+
+    def save(self, *args, **kwargs):
+        self.parse_rate()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rate_range' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.RATE_FIELDS)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rate_min']),
+            models.Index(fields=['rate_max']),
+        ]
+
 
 class Project(models.Model):
     user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='projects')
@@ -176,6 +254,7 @@ class Project(models.Model):
     project_description = models.TextField(blank=True)
     project_url = models.URLField(blank=True)
     project_image = models.ImageField(upload_to='project_images/', null=True, blank=True)
+    project_image_variants = models.JSONField(default=dict, blank=True)
 
 
 class SocialLink(models.Model):
@@ -212,9 +291,13 @@ class Review(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
-        avg_rating = self.user.client_reviews.aggregate(Avg('rating'))['rating__avg']
-        self.user.rating = avg_rating
-        self.user.save(update_fields=['rating'])
+        self.user.refresh_review_stats()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's reviews, newest first
+            models.Index(fields=['user', 'created_at']),
+        ]
 
 
 class ProfileShare(models.Model):
@@ -235,6 +318,142 @@ class ProfileShare(models.Model):
         ordering = ['-created_at']
 
 
+class Skill(models.Model):
+    """
+    A normalized skill ("Python", "C++") parsed out of the free-text
+    primary_tools/technical_skills fields.
+    """
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)  # lowercased, whitespace-collapsed name
+
+    def __str__(self):
+        return self.name
+
+
+class UserSkill(models.Model):
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='user_skills')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='user_skills')
+
+    class Meta:
+        # skill leads: filtering is always "which users have skill X"
+        unique_together = ('skill', 'user')
+
+
+class SearchPosting(models.Model):
+    """
+    One entry of the profile inverted index: a term and how often (weighted
+    by field) it occurs in a user's searchable text.
+    """
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='search_postings')
+    term = models.CharField(max_length=64)
+    frequency = models.FloatField()
+    doc_length = models.FloatField()
+
+    class Meta:
+        # (term, user) doubles as the posting-list index: lookups are always by term
+        unique_together = ('term', 'user')
+
+    def __str__(self):
+        return f"{self.term} -> {self.user_id}"
+
+
+class ProfileSearchDocument(models.Model):
+    """
+    Denormalized, search-only copy of a profile: the text and ranking signals
+    otherwise spread across Users, ServiceCategory, Experience, Certification
+    and Project, so search filters read a single narrow table.
+    """
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    skills = models.TextField(blank=True)
+    categories = models.TextField(blank=True)
+    positions = models.TextField(blank=True)
+    companies = models.TextField(blank=True)
+    certifications = models.TextField(blank=True)
+    projects = models.TextField(blank=True)
+    subscription_type = models.CharField(max_length=10, blank=True)
+    rating = models.FloatField(default=0)
+    verification_percentage = models.IntegerField(default=0)
+    # Query-independent part of the relevance blend (search.static_relevance)
+    static_relevance = models.FloatField(default=0)
+    # Cheapest and most expensive parsed ServiceCategory rates
+    rate_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    rate_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    rate_currency = models.CharField(max_length=3, blank=True)
+    rate_unit = models.CharField(max_length=10, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating']),
+            models.Index(fields=['verification_percentage']),
+            models.Index(fields=['subscription_type']),
+            # Default search ordering ('-relevance', 'id') and its keyset cursor
+            models.Index(fields=['-static_relevance', 'user']),
+            # (rate_min, user) serves both the range filter and sort_by=rate with its id tie-break
+            models.Index(fields=['rate_min', 'user']),
+            models.Index(fields=['rate_max']),
+        ]
+
+    def __str__(self):
+        return f"Search document for {self.user_id}"
+
+
+class AutocompleteTerm(models.Model):
+    """
+    A suggestion for the search box (a name, skill or service category) and
+    how many profiles currently use it.
+    """
+    KIND_CHOICES = [('name', 'Name'), ('skill', 'Skill'), ('category', 'Category')]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=100)  # lowercased text the typed prefix is matched against
+    display = models.CharField(max_length=100)
+    weight = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # key leads so prefix lookups are an index range scan
+        unique_together = ('key', 'kind')
+
+    def __str__(self):
+        return f"{self.display} ({self.kind})"
+
+
+class AutocompleteEntry(models.Model):
+    """
+    Which suggestions a user contributes; lets a profile edit adjust only
+    the weights that actually changed.
+    """
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='autocomplete_entries')
+    term = models.ForeignKey(AutocompleteTerm, on_delete=models.CASCADE, related_name='entries')
+
+    class Meta:
+        unique_together = ('user', 'term')
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload in progress (see api/uploads.py). Bytes received so far
+    live in a part file under CHUNKED_UPLOAD_ROOT until the upload is finalized.
+    """
+    STATUS_CHOICES = [('uploading', 'Uploading'), ('complete', 'Complete')]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)  # bytes received so far
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Finding abandoned uploads to clean up
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
 @receiver(post_save, sender=Users)
 def handle_verification_status_change(sender, instance, **kwargs):
     if kwargs.get('update_fields') and any(field in kwargs['update_fields'] for field in ['gov_id_verified', 'address_verified']):
@@ -242,3 +461,20 @@ def handle_verification_status_change(sender, instance, **kwargs):
             instance.send_verification_status_email('gov_id', instance.gov_id_verified)
         if 'address_verified' in kwargs['update_fields']:
             instance.send_verification_status_email('address', instance.address_verified)
+
+
+class MediaBlob(models.Model):
+    """
+    A file stored by ContentAddressedStorage (see api/storage.py) and the
+    number of file-field references to it. The file is removed when the
+    count drops to zero.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
@@ -0,0 +1,154 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the ordering values of the last row served instead of
+an OFFSET, so page 500 costs the same index range scan as page 1. The last
+ordering field must be unique (normally 'id') to give a stable tie-break.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _cursor_value(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering):
+        # e.g. ('-rating', '-id'); a leading '-' means descending
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.next_position = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, position):
+        payload = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        # Ordering values are strings, numbers or NULL; anything else was tampered with
+        if any(
+            value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float)))
+            for value in position
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def keyset_filter(self, position):
+        """
+        Build "row comes after position" as
+        (a > x) OR (a = x AND b > y) OR ... honouring each field's direction.
+        NULLs sort lowest, as on MySQL and SQLite.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, position):
+            if value is None:
+                if not descending:
+                    condition |= equal & Q(**{f'{name}__isnull': False})
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            lookup = 'lt' if descending else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if descending:
+                after |= Q(**{f'{name}__isnull': True})
+            condition |= equal & after
+            equal &= Q(**{name: value})
+        return condition
+
+    def _comes_after(self, item, position):
+        for (name, descending), value in zip(self.fields, position):
+            current = _cursor_value(getattr(item, name))
+            if current == value:
+                continue
+            if current is None or value is None:
+                # NULLs sort lowest
+                return (current is None) == descending
+            return current < value if descending else current > value
+        return False
+
+    def position_of(self, item):
+        return [_cursor_value(getattr(item, name)) for name, _ in self.fields]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Accepts a QuerySet (ordered and filtered in SQL) or a list that is
+        already sorted by self.ordering.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if isinstance(queryset, QuerySet):
+            queryset = queryset.order_by(*self.ordering)
+            if position is not None:
+                try:
+                    queryset = queryset.filter(self.keyset_filter(position))
+                except (TypeError, ValueError, ValidationError):
+                    # Right JSON type, wrong for the field (e.g. a word for a rating)
+                    raise NotFound(self.invalid_cursor_message)
+            page = list(queryset[:page_size + 1])
+        else:
+            items = queryset
+            if position is not None:
+                try:
+                    items = [item for item in items if self._comes_after(item, position)]
+                except TypeError:
+                    raise NotFound(self.invalid_cursor_message)
+            page = list(items[:page_size + 1])
+
+        has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_position = self.position_of(page[-1]) if has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,260 @@
+"""
+Profile read path.
+
+A full profile is a Users row plus five reverse relations (reviews are only
+summarized here and paginated by views.get_reviews). Loading them through
+the prefetches below keeps a profile read at a fixed number of queries:
+
+    owner profile (UserProfileView.get): 1 auth lookup + 5 prefetches
+    public profile (PublicProfileSerializer): 1 user lookup + 4 prefetches
+    profile by slug (public_profile_by_slug): 1 user lookup on a cache hit
+    batch of public profiles (public_profiles_batch): 1 user query + at most
+        4 prefetches shared by all cache misses, whatever the batch size
+
+Sparse requests (?fields= / ?expand=) prefetch only the relations they
+render, so e.g. ?fields=first_name,experiences costs 1 + 1 queries.
+
+Rendered JSON is cached per user and representation and dropped by signals
+on any profile write, so a cache hit costs neither queries nor serialization.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, F, Prefetch, Value, prefetch_related_objects
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.settings import api_settings
+
+from .models import (
+    Certification, Experience, Project, ServiceCategory, SocialLink, Users, version_timestamp,
+)
+from .serializers import AnonymousProfileSerializer, PublicProfileSerializer, UserProfileSerializer
+
+
+def owner_profile_prefetches(relations=None):
+    prefetches = [
+        Prefetch('social_links', queryset=SocialLink.objects.order_by('id')),
+        Prefetch('experiences', queryset=Experience.objects.order_by('id')),
+        Prefetch('certifications', queryset=Certification.objects.order_by('id')),
+        Prefetch('categories', queryset=ServiceCategory.objects.order_by('id')),
+        Prefetch('projects', queryset=Project.objects.order_by('id')),
+    ]
+    return _only_relations(prefetches, relations)
+
+
+def public_profile_prefetches(relations=None):
+    prefetches = [
+        Prefetch('categories', queryset=ServiceCategory.objects.order_by('id')),
+        Prefetch('experiences', queryset=Experience.objects.order_by('id')),
+        Prefetch('certifications', queryset=Certification.objects.order_by('id')),
+        Prefetch('projects', queryset=Project.objects.order_by('id')),
+    ]
+    return _only_relations(prefetches, relations)
+
+
+def _only_relations(prefetches, relations):
+    if relations is None:
+        return prefetches
+    return [prefetch for prefetch in prefetches if prefetch.prefetch_through in relations]
+
+
+# Bump when a representation's shape changes, so cached bodies and client
+# ETags from the previous shape stop matching
+PROFILE_SCHEMA_VERSION = 3
+
+# representation -> (serializer, prefetches for the related data it reads)
+PROFILE_REPRESENTATIONS = {
+    'owner': (UserProfileSerializer, owner_profile_prefetches),
+    'public': (PublicProfileSerializer, public_profile_prefetches),
+    'anonymous': (AnonymousProfileSerializer, public_profile_prefetches),
+}
+
+
+def profile_variant(representation, fields=None, expand=None):
+    """
+    Name of one rendering of a profile: the bare representation for the
+    default payload, or the representation plus a digest of the field selection.
+    """
+    if fields is None and expand is None:
+        return representation
+    selection = f"fields={','.join(sorted(fields or ()))};expand={','.join(sorted(expand or ()))}"
+    return f'{representation}.{hashlib.sha1(selection.encode()).hexdigest()[:12]}'
+
+
+def profile_cache_key(user_id, variant):
+    return f'profile:json:v{PROFILE_SCHEMA_VERSION}:{variant}:{user_id}'
+
+
+def render_json(data):
+    # The configured JSON renderer (orjson-backed by default), matching what
+    # DRF itself would send for a Response
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+
+
+def profile_json(user, representation, fields=None, expand=None):
+    """
+    Rendered JSON bytes of a profile representation, served from cache when
+    the cached copy was rendered from the user's current profile_version.
+    """
+    return profiles_json([user], representation, fields, expand)[user.pk]
+
+
+def profiles_json(users, representation, fields=None, expand=None):
+    """
+    profile_json for many users at once: {user pk: JSON bytes}. Cache misses
+    are loaded together, one prefetch query per relation however many
+    users miss.
+    """
+    variant = profile_variant(representation, fields, expand)
+    keys = {user.pk: profile_cache_key(user.pk, variant) for user in users}
+    cached = cache.get_many(keys.values())
+
+    bodies = {}
+    misses = []
+    for user in users:
+        entry = cached.get(keys[user.pk])
+        if entry is not None and entry['version'] == user.profile_version:
+            bodies[user.pk] = entry['body']
+        else:
+            misses.append(user)
+
+    if misses:
+        serializer_class, prefetches = PROFILE_REPRESENTATIONS[representation]
+        relations = None
+        if fields is not None or expand is not None:
+            relations = serializer_class.required_relations(fields, expand)
+        prefetch_related_objects(misses, *prefetches(relations))
+
+        rendered = {}
+        for user in misses:
+            body = render_json(serializer_class(user, fields=fields, expand=expand).data)
+            bodies[user.pk] = body
+            rendered[keys[user.pk]] = {'version': user.profile_version, 'body': body}
+        cache.set_many(rendered, timeout=settings.PROFILE_JSON_CACHE_TIMEOUT)
+    return bodies
+
+
+def invalidate_profile_cache(user_id):
+    """
+    Drop the default renderings. Sparse variants are keyed by selection and
+    can't be enumerated; the version check in profile_json keeps them from
+    being served stale until they expire.
+    """
+    cache.delete_many([profile_cache_key(user_id, representation) for representation in PROFILE_REPRESENTATIONS])
+
+
+def bump_profile_version(user_id):
+    """
+    Mark a user's profile as changed after a write to one of its related rows.
+    A queryset update, so it doesn't re-trigger Users signals.
+    """
+    now = timezone.now()
+    Users.objects.filter(pk=user_id).update(
+        profile_version=Greatest(
+            F('profile_version') + 1, Value(version_timestamp(now)), output_field=BigIntegerField()
+        ),
+        profile_updated_at=now,
+    )
+
+
+def profile_etag(user, representation):
+    """
+    Strong ETag for one representation ('owner', 'public', ...) of a profile.
+    """
+    return f'"{user.pk.hex}-{user.profile_version}-{representation}-v{PROFILE_SCHEMA_VERSION}"'
+
+
+def profile_last_modified(user):
+    if user.profile_updated_at is None:
+        return None
+    return int(user.profile_updated_at.timestamp())
+
+
+def conditional_profile_response(request, user, representation):
+    """
+    304 Not Modified (or 412) when the client's If-None-Match / If-Modified-Since
+    already matches the profile version, otherwise None. Needs only the
+    Users row, so it runs before any related data is loaded or serialized.
+    """
+    etag = profile_etag(user, representation)
+    response = get_conditional_response(request, etag=etag, last_modified=profile_last_modified(user))
+    if response is not None:
+        set_profile_validators(response, user, representation)
+    return response
+
+
+def set_profile_validators(response, user, representation):
+    response['ETag'] = profile_etag(user, representation)
+    last_modified = profile_last_modified(user)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def profile_surrogate_key(user_id):
+    return f'profile-{user_id.hex}'
+
+
+def set_edge_cache_headers(response, user):
+    """
+    Let browsers and a CDN in front of the API cache a public profile. The CDN
+    keeps serving a stale copy while it revalidates, and can be purged per
+    profile through the Surrogate-Key (see purge_profile_edge_cache).
+    """
+    response['Cache-Control'] = (
+        f'public, max-age={settings.PUBLIC_PROFILE_MAX_AGE}, '
+        f's-maxage={settings.PUBLIC_PROFILE_SHARED_MAX_AGE}, '
+        f'stale-while-revalidate={settings.PUBLIC_PROFILE_STALE_WHILE_REVALIDATE}'
+    )
+    response['Surrogate-Key'] = f'{profile_surrogate_key(user.pk)} profiles'
+    return response
+
+
+def purge_profile_edge_cache(user_id):
+    """
+    Ask the CDN to drop everything tagged with a profile's surrogate key.
+    A no-op unless CDN_PURGE_URL is configured; failures are logged, since
+    the edge copy expires on its own after PUBLIC_PROFILE_SHARED_MAX_AGE.
+    """
+    if not settings.CDN_PURGE_URL:
+        return
+    try:
+        response = requests.post(
+            f'{settings.CDN_PURGE_URL.rstrip("/")}/{profile_surrogate_key(user_id)}',
+            headers={'Fastly-Key': settings.CDN_PURGE_TOKEN, 'Fastly-Soft-Purge': '1'},
+            timeout=5,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.getLogger(__name__).warning(f"CDN purge failed for profile {user_id}: {e}")
+
+
+_purge_executor = None
+
+
+def purge_executor():
+    global _purge_executor
+    if _purge_executor is None:
+        _purge_executor = ThreadPoolExecutor(max_workers=settings.CDN_PURGE_WORKERS, thread_name_prefix='cdn-purge')
+    return _purge_executor
+
+
+def schedule_edge_purge(user_id):
+    """
+    purge_profile_edge_cache() on a worker thread, so the request that
+    changed the profile doesn't wait on the CDN. CDN_PURGE_WORKERS=0 purges
+    inline.
+    """
+    if not settings.CDN_PURGE_URL:
+        return
+    if settings.CDN_PURGE_WORKERS:
+        purge_executor().submit(purge_profile_edge_cache, user_id)
+    else:
+        purge_profile_edge_cache(user_id)
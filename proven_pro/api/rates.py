@@ -0,0 +1,76 @@
+"""
+Parsing of the free-text ServiceCategory.rate_range ("$20-40/hr",
+"PHP 500 per day", "1.5k - 2k / project") into numeric columns.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+CURRENCY_SYMBOLS = {
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+    '₱': 'PHP',
+    '₹': 'INR',
+    '¥': 'JPY',
+}
+
+CURRENCY_CODES = {'USD', 'EUR', 'GBP', 'PHP', 'INR', 'JPY', 'AUD', 'CAD', 'SGD'}
+
+UNIT_PATTERNS = (
+    ('hour', re.compile(r'\b(?:hr|hrs|hour|hours|hourly|h)\b')),
+    ('day', re.compile(r'\b(?:day|days|daily)\b')),
+    ('week', re.compile(r'\b(?:wk|week|weeks|weekly)\b')),
+    ('month', re.compile(r'\b(?:mo|month|months|monthly)\b')),
+    ('project', re.compile(r'\b(?:project|projects|fixed)\b')),
+)
+
+AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(k)?\b', re.IGNORECASE)
+
+# Matches the ServiceCategory.rate_min/rate_max column size
+MAX_AMOUNT = Decimal('9999999999.99')
+
+
+def _amount(number, thousands):
+    try:
+        value = Decimal(number.replace(',', ''))
+    except InvalidOperation:
+        return None
+    if thousands:
+        value *= 1000
+    return value if value <= MAX_AMOUNT else None
+
+
+def parse_rate_range(text):
+    """
+    Returns (rate_min, rate_max, currency, unit); any part may be None/''
+    when the text doesn't say. A single amount is both min and max.
+    """
+    if not text:
+        return None, None, '', ''
+
+    lowered = text.lower()
+    amounts = [
+        amount for amount in (_amount(number, k) for number, k in AMOUNT_RE.findall(text))
+        if amount is not None
+    ][:2]
+
+    currency = ''
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = code
+            break
+    if not currency:
+        for code in re.findall(r'\b[a-z]{3}\b', lowered):
+            if code.upper() in CURRENCY_CODES:
+                currency = code.upper()
+                break
+
+    unit = ''
+    for name, pattern in UNIT_PATTERNS:
+        if pattern.search(lowered):
+            unit = name
+            break
+
+    if not amounts:
+        return None, None, currency, unit
+    return min(amounts), max(amounts), currency, unit
@@ -0,0 +1,57 @@
+"""
+orjson-backed JSON renderer and parser.
+
+Drop-in replacements for DRF's JSONRenderer/JSONParser that produce the same
+JSON several times faster. orjson is optional: without it both classes fall
+back to the stock DRF implementation.
+
+Values orjson can't serialize natively (Decimal, lazy strings, querysets, ...)
+and datetimes go through DRF's own encoder, so output matches JSONRenderer:
+UUIDs as strings, Decimal as numbers, datetimes in DRF's ISO 8601 format.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSONRenderer escapes these for embedding in <script>; keep doing so
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=options)
+        except orjson.JSONEncodeError as e:
+            raise TypeError(str(e)) from e
+
+        for separator, escaped in LINE_SEPARATORS:
+            ret = ret.replace(separator, escaped)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,435 @@
+"""
+Inverted-index profile search.
+
+Every user's searchable text (names, bio, tools and skills, service categories
+and work experience) is tokenized into SearchPosting rows. A query only reads
+the posting lists of its own terms and ranks the matching users with BM25, so
+the cost of a search follows the number of matching postings rather than the
+size of the users table.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import SearchPosting, ProfileSearchDocument, Users
+from .utils import bulk_upsert
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'the', 'to', 'with',
+}
+
+MAX_TERM_LENGTH = 64
+
+# Matches in a name count for more than matches buried in a long bio
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'skills': 2.0,
+    'services': 2.0,
+    'experience': 1.5,
+    'bio': 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CORPUS_STATS_CACHE_KEY = 'search:corpus_stats'
+CORPUS_STATS_TIMEOUT = 60 * 10
+
+# Default weights of the relevance blend; override any of them with
+# settings.SEARCH_RELEVANCE_WEIGHTS. Every signal is scaled to 0..1 first.
+# All but 'text' are baked into ProfileSearchDocument.static_relevance, so
+# changing them takes a rebuild_search_documents run.
+DEFAULT_RELEVANCE_WEIGHTS = {
+    'text': 4.0,
+    'rating': 1.0,
+    'reviews': 1.0,
+    'verification': 1.0,
+    'subscription': 0.5,
+}
+
+# Review counts above this stop adding to relevance
+REVIEW_COUNT_SATURATION = 50
+
+SUBSCRIPTION_RELEVANCE = {'free': 0.0, 'standard': 0.5, 'premium': 1.0}
+
+# A query candidate with its blended relevance
+RankedProfile = namedtuple('RankedProfile', ['id', 'relevance'])
+
+# verification_percentage is a sum of 50/25/25, so these are the only levels
+VERIFICATION_TIERS = (0, 25, 50, 75, 100)
+
+# (label, lower bound inclusive, upper bound exclusive); ratings run 0-5
+RATING_BANDS = (
+    ('4-5', 4, None),
+    ('3-4', 3, 4),
+    ('2-3', 2, 3),
+    ('1-2', 1, 2),
+    ('0-1', 0, 1),
+)
+
+# Query parameters that change which profiles match (and so the facets)
+FILTER_PARAMS = (
+    'q', 'job_title', 'job_specialization', 'language', 'rate_min', 'rate_max', 'currency',
+    'skills', 'skills_match',
+)
+
+# Everything else that changes the rendered results page
+RESULT_PARAMS = FILTER_PARAMS + ('sort_by', 'cursor', 'page_size', 'fields', 'expand')
+
+# Normalized form of a q that has text but no index terms ("the", "?!"). It
+# can't be a token, so it never matches anything and never shares a cache key
+# with an unfiltered search.
+NO_TERMS_QUERY = '-'
+
+# Bumped on every search-relevant write; cache keys embed the current value,
+# so invalidation never has to find or delete the stale entries.
+GENERATION_CACHE_KEY = 'search:generation'
+
+
+def tokenize(text):
+    """
+    Split text into lowercase index terms, dropping stop words.
+    """
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if token not in STOP_WORDS
+    ]
+
+
+LIST_SEPARATORS_RE = re.compile(r"[,;|/\n]+")
+
+
+def split_list_field(text, max_length=100):
+    """
+    Split a comma-ish free-text list ("Python, Django; AWS") into its items,
+    keeping the original spelling.
+    """
+    if not text:
+        return []
+    items = (' '.join(item.split())[:max_length] for item in LIST_SEPARATORS_RE.split(text))
+    return [item for item in items if item]
+
+
+def profile_text(user):
+    """
+    Collect the searchable text of a user, grouped by weighted field.
+    Uses prefetched categories/experiences when available.
+    """
+    categories = user.categories.all()
+    experiences = user.experiences.all()
+    return {
+        'name': ' '.join([user.first_name, user.last_name]),
+        'bio': user.bio,
+        'skills': ' '.join([user.primary_tools, user.technical_skills, user.soft_skills]),
+        'services': ' '.join(
+            f"{category.services_categories} {category.services_description}"
+            for category in categories
+        ),
+        'experience': ' '.join(
+            f"{experience.position} {experience.company_name}"
+            for experience in experiences
+        ),
+    }
+
+
+def build_postings(user):
+    """
+    Build (unsaved) SearchPosting objects for a single user.
+    """
+    frequencies = defaultdict(float)
+    for field, text in profile_text(user).items():
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            frequencies[token] += weight
+
+    doc_length = sum(frequencies.values())
+    return [
+        SearchPosting(user_id=user.pk, term=term, frequency=frequency, doc_length=doc_length)
+        for term, frequency in frequencies.items()
+    ]
+
+
+def index_users(users):
+    """
+    Replace the postings of the given users. Callers iterating over many users
+    should prefetch 'categories' and 'experiences'.
+    """
+    users = list(users)
+    if not users:
+        return
+    postings = []
+    for user in users:
+        postings.extend(build_postings(user))
+
+    with transaction.atomic():
+        SearchPosting.objects.filter(user__in=[user.pk for user in users]).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+
+
+DOCUMENT_FIELDS = [
+    'skills', 'categories', 'positions', 'companies', 'certifications', 'projects',
+    'subscription_type', 'rating', 'verification_percentage', 'static_relevance',
+    'rate_min', 'rate_max', 'rate_currency', 'rate_unit', 'updated_at',
+]
+
+# Related collections a search document is built from; prefetch these
+DOCUMENT_PREFETCH = ('categories', 'experiences', 'certifications', 'projects')
+
+
+def _join(values):
+    return '\n'.join(value for value in values if value)
+
+
+def build_search_document(user):
+    """
+    Build an (unsaved) ProfileSearchDocument for a user with DOCUMENT_PREFETCH
+    relations loaded.
+    """
+    categories = user.categories.all()
+    experiences = user.experiences.all()
+    priced = [category for category in categories if category.rate_min is not None]
+    cheapest = min(priced, key=lambda category: category.rate_min) if priced else None
+    return ProfileSearchDocument(
+        user_id=user.pk,
+        skills=_join([user.primary_tools, user.technical_skills, user.soft_skills]),
+        categories=_join(category.services_categories for category in categories),
+        positions=_join(experience.position for experience in experiences),
+        companies=_join(experience.company_name for experience in experiences),
+        certifications=_join(cert.certifications_name for cert in user.certifications.all()),
+        projects=_join(project.project_title for project in user.projects.all()),
+        subscription_type=user.subscription_type,
+        rating=user.rating or 0,
+        verification_percentage=user.verification_percentage,
+        static_relevance=static_relevance(user),
+        rate_min=cheapest.rate_min if cheapest else None,
+        rate_max=max(category.rate_max for category in priced) if priced else None,
+        rate_currency=cheapest.rate_currency if cheapest else '',
+        rate_unit=cheapest.rate_unit if cheapest else '',
+    )
+
+
+def save_search_documents(users):
+    """
+    Upsert the search documents of the given users in one statement.
+    """
+    documents = [build_search_document(user) for user in users]
+    if documents:
+        bulk_upsert(ProfileSearchDocument, documents, unique_fields=['user'], update_fields=DOCUMENT_FIELDS)
+
+
+def corpus_stats():
+    """
+    Number of indexed profiles and their average weighted length. This is the
+    only full-table aggregate, so it is cached and allowed to drift a little.
+    """
+    stats = cache.get(CORPUS_STATS_CACHE_KEY)
+    if stats is None:
+        totals = SearchPosting.objects.aggregate(
+            documents=Count('user', distinct=True),
+            length=Sum('frequency'),
+        )
+        documents = totals['documents'] or 0
+        stats = {
+            'documents': documents,
+            'avg_length': (totals['length'] or 0) / documents if documents else 0,
+        }
+        cache.set(CORPUS_STATS_CACHE_KEY, stats, timeout=CORPUS_STATS_TIMEOUT)
+    return stats
+
+
+def search_profiles(query, limit=None):
+    """
+    Rank users for a free-text query.
+
+    Terms are OR-ed together and scored with BM25, so profiles matching more
+    (and rarer) terms come first. The last query term also matches as a prefix
+    ("pyth" finds "python") which keeps search-as-you-type useful.
+
+    Returns a list of (user_id, score) sorted by descending score, capped at
+    SEARCH_MAX_CANDIDATES.
+    """
+    return search_candidates(query, limit)[0]
+
+
+def search_candidates(query, limit=None):
+    """
+    search_profiles() plus whether the cap cut matches off: (ranked, truncated).
+    Only the best SEARCH_MAX_CANDIDATES matches can be paged through or
+    counted in facets; callers report truncation rather than hide it.
+    """
+    if limit is None:
+        limit = getattr(settings, 'SEARCH_MAX_CANDIDATES', 1000)
+
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return [], False
+
+    postings = SearchPosting.objects.filter(term__in=terms)
+    prefix = terms[-1]
+    if len(prefix) >= 3:
+        # Terms are stored lowercased; istartswith keeps MySQL on the (term, user) index
+        postings = postings | SearchPosting.objects.filter(term__istartswith=prefix)
+
+    rows = list(postings.values_list('user_id', 'term', 'frequency', 'doc_length'))
+    if not rows:
+        return [], False
+
+    document_frequency = defaultdict(int)
+    for _, term, _, _ in rows:
+        document_frequency[term] += 1
+
+    stats = corpus_stats()
+    documents = max(stats['documents'], len(rows))
+    avg_length = stats['avg_length'] or 1.0
+
+    scores = defaultdict(float)
+    for user_id, term, frequency, doc_length in rows:
+        df = document_frequency[term]
+        idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+        scores[user_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+    return ranked[:limit], len(ranked) > limit
+
+
+def relevance_weights():
+    return {**DEFAULT_RELEVANCE_WEIGHTS, **getattr(settings, 'SEARCH_RELEVANCE_WEIGHTS', {})}
+
+
+def static_relevance(user):
+    """
+    The query-independent part of relevance: rating, review count,
+    verification level and subscription tier. Stored (and indexed) on the
+    search document, so default ordering is an index scan; rounded so keyset
+    cursors compare exactly.
+    """
+    weights = relevance_weights()
+    value = (
+        (user.rating or 0) / 5.0 * weights['rating']
+        + min(user.review_count or 0, REVIEW_COUNT_SATURATION) / REVIEW_COUNT_SATURATION * weights['reviews']
+        + (user.verification_percentage or 0) / 100.0 * weights['verification']
+        + SUBSCRIPTION_RELEVANCE.get(user.subscription_type, 0.0) * weights['subscription']
+    )
+    return round(value, 6)
+
+
+def rank_candidates(rows, scores):
+    """
+    Blend text scores into static relevance for the candidates of a query.
+
+    rows are (user_id, static_relevance) pairs of the filtered candidates and
+    scores the {user_id: bm25} result of search_profiles(); both are bounded
+    by SEARCH_MAX_CANDIDATES. Returns RankedProfile tuples sorted by
+    ('-relevance', 'id'), ready for KeysetPagination.
+    """
+    weight = relevance_weights()['text']
+    best = max(scores.values(), default=0) or 1.0
+    ranked = [
+        RankedProfile(user_id, round((static or 0) + scores.get(user_id, 0) / best * weight, 6))
+        for user_id, static in rows
+    ]
+    ranked.sort(key=lambda profile: (-profile.relevance, profile.id))
+    return ranked
+
+
+def normalize_search_params(params, keys=FILTER_PARAMS):
+    """
+    Canonical form of the search parameters, so that "Python ", "python"
+    and "the python" share cache entries.
+    """
+    normalized = {}
+    for key in keys:
+        value = params.get(key)
+        if not value:
+            continue
+        if key == 'q':
+            value = ' '.join(tokenize(value)) or (NO_TERMS_QUERY if value.strip() else '')
+        elif key == 'cursor':
+            value = value.strip()
+        elif key in ('fields', 'expand'):
+            value = ','.join(sorted({name.strip() for name in value.lower().split(',') if name.strip()}))
+        else:
+            value = ' '.join(value.lower().split())
+        if value:
+            normalized[key] = value
+    return normalized
+
+
+def search_generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # come back to a generation that still has entries cached under it
+        cache.add(GENERATION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_search_generation():
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        search_generation()
+
+
+def search_cache_key(prefix, normalized):
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f'search:{prefix}:{search_generation()}:{digest}'
+
+
+def facet_counts(users):
+    """
+    Facet counts for a filtered Users queryset, computed with one conditional
+    aggregate query rather than a COUNT/GROUP BY per facet.
+    """
+    aggregates = {}
+    for value, _ in Users.SUBSCRIPTION_CHOICES:
+        aggregates[f'subscription_{value}'] = Count('pk', filter=Q(subscription_type=value))
+    for tier in VERIFICATION_TIERS:
+        aggregates[f'verification_{tier}'] = Count('pk', filter=Q(verification_percentage=tier))
+    for label, low, high in RATING_BANDS:
+        band = Q(rating__gte=low)
+        if high is not None:
+            band &= Q(rating__lt=high)
+        aggregates[f'rating_{label}'] = Count('pk', filter=band)
+
+    counts = users.order_by().aggregate(**aggregates)
+    return {
+        'subscription_type': {
+            value: counts[f'subscription_{value}'] for value, _ in Users.SUBSCRIPTION_CHOICES
+        },
+        'verification_level': {
+            str(tier): counts[f'verification_{tier}'] for tier in VERIFICATION_TIERS
+        },
+        'rating': {
+            label: counts[f'rating_{label}'] for label, _, _ in RATING_BANDS
+        },
+    }
+
+
+def cached_facet_counts(users, params):
+    """
+    facet_counts() cached per normalized filter set; sorting and paging
+    don't change facets, so they are not part of the key.
+    """
+    key = search_cache_key('facets', normalize_search_params(params))
+    facets = cache.get(key)
+    if facets is None:
+        facets = facet_counts(users)
+        cache.set(key, facets, timeout=getattr(settings, 'SEARCH_FACETS_CACHE_TIMEOUT', 60 * 5))
+    return facets
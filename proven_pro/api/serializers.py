@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.conf import settings
 from .models import SocialLink, Review, ProfileShare, Experience, Certification, ServiceCategory, Project
+from .utils import bulk_upsert
+from .images import image_url, image_variant_urls
 import re
 
 Users = get_user_model()
@@ -73,11 +76,15 @@ class ExperienceSerializer(serializers.ModelSerializer):
 
 
 class CertificationSerializer(serializers.ModelSerializer):
+    certifications_image_variants = serializers.SerializerMethodField(read_only=True)
+
+    def get_certifications_image_variants(self, obj):
+        return image_variant_urls(obj, 'certifications_image')
     
     class Meta:
         model = Certification
         fields = ('id', 'certifications_name', 'certifications_issuer', 'certifications_issued_date', 'certifications_expiration_date', 'certifications_id', 
-                  'certifications_image_url')
+                  'certifications_image_url', 'certifications_image_variants')
         # Remove 'user' from fields to avoid circular reference
 
 
@@ -89,22 +96,213 @@ class ServiceCategorySerializer(serializers.ModelSerializer):
 
 
 class ProjectSerializer(serializers.ModelSerializer):
+    project_image_url = serializers.SerializerMethodField(read_only=True)
+    project_image_variants = serializers.SerializerMethodField(read_only=True)
+
+    def get_project_image_url(self, obj):
+        return image_url(obj, 'project_image', 'medium')
 
+    def get_project_image_variants(self, obj):
+        return image_variant_urls(obj, 'project_image')
     
     class Meta:
         model = Project
-        fields = ('id', 'project_title', 'project_description', 'project_url',)
+        fields = ('id', 'project_title', 'project_description', 'project_url', 'project_image_url',
+                  'project_image_variants')
         # Remove 'user' from fields to avoid circular reference
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
-    # Include all related data with nested serializers
+class NestedItemMixin(serializers.Serializer):
+    """
+    One entry of a nested write on the profile: no id creates a row, an id
+    updates that row (only the fields sent), and {"id": ..., "delete": true}
+    removes it.
+    """
+    id = serializers.IntegerField(required=False)
+    delete = serializers.BooleanField(required=False, write_only=True)
+
+    # Fields a new row must have; the parent is validated with partial=True
+    CREATE_REQUIRED = ()
+
+    def validate(self, attrs):
+        if attrs.get('delete') and 'id' not in attrs:
+            raise serializers.ValidationError("delete needs an id")
+        if 'id' not in attrs:
+            missing = [name for name in self.CREATE_REQUIRED if not attrs.get(name)]
+            if missing:
+                raise serializers.ValidationError({name: "This field is required." for name in missing})
+        return attrs
+
+
+class ExperienceItemSerializer(NestedItemMixin, ExperienceSerializer):
+    CREATE_REQUIRED = ('company_name', 'position')
+
+    class Meta(ExperienceSerializer.Meta):
+        fields = ExperienceSerializer.Meta.fields + ('delete',)
+
+
+class CertificationItemSerializer(NestedItemMixin, CertificationSerializer):
+    CREATE_REQUIRED = ('certifications_name', 'certifications_issuer', 'certifications_issued_date')
+
+    class Meta(CertificationSerializer.Meta):
+        fields = CertificationSerializer.Meta.fields + ('delete',)
+
+
+class ProjectItemSerializer(NestedItemMixin, ProjectSerializer):
+    CREATE_REQUIRED = ('project_title',)
+
+    class Meta(ProjectSerializer.Meta):
+        fields = ProjectSerializer.Meta.fields + ('delete',)
+
+
+# profile field -> model written by nested item lists
+NESTED_WRITE_MODELS = {
+    'experiences': Experience,
+    'certifications': Certification,
+    'projects': Project,
+}
+
+
+def apply_nested_writes(user, name, items):
+    """
+    Apply a list of nested items to one of the user's relations with at most
+    one DELETE, one bulk_update and one bulk_create. Bulk writes send no
+    model signals; the caller is responsible for marking the profile changed.
+    """
+    model = NESTED_WRITE_MODELS[name]
+    deletes = [item['id'] for item in items if item.get('delete')]
+    updates = {item['id']: item for item in items if 'id' in item and not item.get('delete')}
+    creates = [item for item in items if 'id' not in item]
+
+    ids = set(deletes) | set(updates)
+    if ids:
+        existing = model.objects.filter(user=user, id__in=ids).in_bulk()
+        unknown = ids - set(existing)
+        if unknown:
+            raise serializers.ValidationError({name: f"Unknown ids: {', '.join(map(str, sorted(unknown)))}"})
+
+    if deletes:
+        model.objects.filter(user=user, id__in=deletes).delete()
+
+    if updates:
+        changed = set()
+        for item_id, item in updates.items():
+            row = existing[item_id]
+            for attr, value in item.items():
+                if attr not in ('id', 'delete'):
+                    setattr(row, attr, value)
+                    changed.add(attr)
+        if changed:
+            model.objects.bulk_update([existing[item_id] for item_id in updates], sorted(changed))
+
+    if creates:
+        model.objects.bulk_create([
+            model(user=user, **{attr: value for attr, value in item.items() if attr != 'delete'})
+            for item in creates
+        ])
+
+
+
+def split_param(value):
+    """
+    'a, b,,c' -> ['a', 'b', 'c']; None when the parameter is missing or empty.
+    """
+    if not value:
+        return None
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= / ?expand= support for read serializers.
+
+    With neither parameter the serializer renders its default representation.
+    Otherwise scalar fields are limited to `fields` (all of them when omitted)
+    and a nested relation is rendered only when named in `fields` or `expand`,
+    so callers can skip relations they don't need - and the views skip
+    loading them (see required_relations).
+    """
+    # relation name -> nested serializer class
+    EXPANDABLE_FIELDS = {}
+    # method field -> relation it reads, so selecting it still loads that relation
+    FIELD_RELATIONS = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        relations = self.selected_relations(fields, expand)
+        for name, serializer_class in self.EXPANDABLE_FIELDS.items():
+            if name in relations:
+                if name not in self.fields:
+                    self.fields[name] = serializer_class(many=True, read_only=True)
+            else:
+                self.fields.pop(name, None)
+
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields and name not in relations and not self.fields[name].write_only:
+                    self.fields.pop(name)
+
+    @classmethod
+    def default_relations(cls):
+        return [name for name in cls.Meta.fields if name in cls.EXPANDABLE_FIELDS]
+
+    @classmethod
+    def selected_relations(cls, fields=None, expand=None):
+        if fields is None and expand is None:
+            return cls.default_relations()
+        requested = list(fields or ()) + list(expand or ())
+        return [name for name in cls.EXPANDABLE_FIELDS if name in requested]
+
+    @classmethod
+    def required_relations(cls, fields=None, expand=None):
+        """
+        Relations that must be prefetched to render this selection.
+        """
+        relations = set(cls.selected_relations(fields, expand))
+        for name, relation in cls.FIELD_RELATIONS.items():
+            if fields is None or name in fields:
+                relations.add(relation)
+        return relations
+
+    @classmethod
+    def readable_fields(cls):
+        return {name for name, field in cls().fields.items() if not field.write_only} | set(cls.EXPANDABLE_FIELDS)
+
+    @classmethod
+    def parse_selection(cls, params):
+        """
+        (fields, expand) from query params, rejecting names this serializer can't render.
+        """
+        fields = split_param(params.get('fields'))
+        expand = split_param(params.get('expand'))
+        unknown = set(fields or ()) - cls.readable_fields()
+        if unknown:
+            raise serializers.ValidationError({'error': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        unknown = set(expand or ()) - set(cls.EXPANDABLE_FIELDS)
+        if unknown:
+            raise serializers.ValidationError({'error': f"Cannot expand: {', '.join(sorted(unknown))}"})
+        return fields, expand
+
+
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    EXPANDABLE_FIELDS = {
+        'social_links': SocialLinkSerializer,
+        'experiences': ExperienceSerializer,
+        'certifications': CertificationSerializer,
+        'categories': ServiceCategorySerializer,
+        'projects': ProjectSerializer,
+    }
+
+    # Include all related data with nested serializers. Reviews are unbounded,
+    # so only their summary is embedded; the list is paginated by get_reviews.
     social_links = SocialLinkSerializer(many=True, read_only=True)
-    client_reviews = ReviewSerializer(many=True, read_only=True)
-    experiences = ExperienceSerializer(many=True, read_only=True)
-    certifications = CertificationSerializer(many=True, read_only=True)
+    review_summary = serializers.SerializerMethodField(read_only=True)
     categories = ServiceCategorySerializer(many=True, read_only=True)
-    projects = ProjectSerializer(many=True, read_only=True)
+
+    # Also writable: lists of items to create, update or delete (see NestedItemMixin)
+    experiences = ExperienceItemSerializer(many=True, required=False)
+    certifications = CertificationItemSerializer(many=True, required=False)
+    projects = ProjectItemSerializer(many=True, required=False)
     
     # Fields for nested creation
     linkedin = serializers.URLField(write_only=True, required=False, allow_blank=True)
@@ -146,17 +344,38 @@ class UserProfileSerializer(serializers.ModelSerializer):
     
     # Add URL fields for reading the file URLs
     profile_pic_url = serializers.SerializerMethodField(read_only=True)
+    profile_pic_variants = serializers.SerializerMethodField(read_only=True)
     video_intro_url = serializers.SerializerMethodField(read_only=True)
     
     def get_profile_pic_url(self, obj):
-        if obj.profile_pic:
-            return obj.profile_pic.url
-        return None
+        return image_url(obj, 'profile_pic', 'medium')
+
+    def get_profile_pic_variants(self, obj):
+        return image_variant_urls(obj, 'profile_pic')
     
     def get_video_intro_url(self, obj):
         if obj.video_intro:
             return obj.video_intro.url
         return None
+
+    def get_review_summary(self, obj):
+        return {'count': obj.review_count, 'average': obj.rating}
+
+    def _validate_item_count(self, items):
+        if len(items) > settings.PROFILE_NESTED_WRITE_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"At most {settings.PROFILE_NESTED_WRITE_MAX_ITEMS} items per request"
+            )
+        return items
+
+    def validate_experiences(self, items):
+        return self._validate_item_count(items)
+
+    def validate_certifications(self, items):
+        return self._validate_item_count(items)
+
+    def validate_projects(self, items):
+        return self._validate_item_count(items)
     
     class Meta:
         model = Users
@@ -166,14 +385,14 @@ class UserProfileSerializer(serializers.ModelSerializer):
             
             # Profile fields
             'first_name', 'last_name', 'bio', 
-            'profile_pic', 'profile_pic_url', 'rating', 'profile_url', 'profile_mail',
+            'profile_pic', 'profile_pic_url', 'profile_pic_variants', 'rating', 'profile_url', 'profile_mail',
             'mobile', 
             
             # Tools & skills
             'primary_tools', 'technical_skills', 'soft_skills', 'skills_description',
             
             # Related models
-            'social_links', 'client_reviews', 'experiences', 'certifications',
+            'social_links', 'review_summary', 'experiences', 'certifications',
             'categories', 'projects',
             'video_intro', 'video_intro_url', 'video_description', 
             
@@ -205,8 +424,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
         facebook = validated_data.pop('facebook', None)
         twitter = validated_data.pop('twitter', None)
         
+        nested = {name: validated_data.pop(name) for name in NESTED_WRITE_MODELS if name in validated_data}
+
         # Create user
         user = Users.objects.create(**validated_data)
+
+        for name, items in nested.items():
+            apply_nested_writes(user, name, items)
         
         # Create social links if provided
         social_links = []
@@ -227,6 +451,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         linkedin = validated_data.pop('linkedin', None)
         facebook = validated_data.pop('facebook', None)
         twitter = validated_data.pop('twitter', None)
+
+        # Extract nested item lists
+        nested = {name: validated_data.pop(name) for name in NESTED_WRITE_MODELS if name in validated_data}
         
         # Extract experience data
         company_name = validated_data.pop('company_name', None)
@@ -255,27 +482,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
         rate_range = validated_data.pop('rate_range', None)
         availability = validated_data.pop('availability', None)
         
-        # Update user
+        # Only the columns whose value actually changed are written, in a
+        # single save at the end (callers run this inside one transaction)
+        changed_fields = []
         for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update social links
-        if linkedin is not None:
-            SocialLink.objects.update_or_create(
-                user=instance, platform='linkedin',
-                defaults={'url': linkedin}
-            )
-        if facebook is not None:
-            SocialLink.objects.update_or_create(
-                user=instance, platform='facebook',
-                defaults={'url': facebook}
-            )
-        if twitter is not None:
-            SocialLink.objects.update_or_create(
-                user=instance, platform='twitter',
-                defaults={'url': twitter}
-            )
+            if getattr(instance, attr) != value:
+                setattr(instance, attr, value)
+                changed_fields.append(attr)
+
+        # Social links: one INSERT ... ON DUPLICATE KEY UPDATE for every platform sent
+        social_links = [
+            SocialLink(user=instance, platform=platform, url=url)
+            for platform, url in (('linkedin', linkedin), ('facebook', facebook), ('twitter', twitter))
+            if url is not None
+        ]
+        if social_links:
+            bulk_upsert(SocialLink, social_links, unique_fields=['user', 'platform'], update_fields=['url'])
+            # Bulk writes send no signals; saving the version marks the profile as changed
+            changed_fields.append('profile_version')
         
         # Create experience if all required fields are provided
         if all([company_name, position, experience_start_date, experience_end_date]):
@@ -288,32 +512,28 @@ class UserProfileSerializer(serializers.ModelSerializer):
                 key_responsibilities=key_responsibilities or ''
             )
         
-        # Create project if title is provided
+        # Create project if title is provided; the image goes into the same INSERT
         if project_title:
-            project = Project.objects.create(
+            Project.objects.create(
                 user=instance,
                 project_title=project_title,
                 project_description=project_description or '',
-                project_url=project_url or ''
+                project_url=project_url or '',
+                # Only set project_image if it's a valid file object
+                project_image=project_image if project_image and hasattr(project_image, 'name') else None,
             )
-            # Only set project_image if it's a valid file object
-            if project_image and hasattr(project_image, 'name'):
-                project.project_image = project_image
-                project.save()
         
         # Create certification if name and issuer are provided
         if certifications_name and certifications_issuer and certifications_issued_date:
-            certification = Certification.objects.create(
+            Certification.objects.create(
                 user=instance,
                 certifications_name=certifications_name,
                 certifications_issuer=certifications_issuer,
                 certifications_issued_date=certifications_issued_date,
                 certifications_expiration_date=certifications_expiration_date,
-                certifications_id=certifications_id or ''
+                certifications_id=certifications_id or '',
+                certifications_image=certifications_image or None,
             )
-            if certifications_image:
-                certification.certifications_image = certifications_image
-                certification.save()
         
         # Update service category if any of the fields are provided
         if any(field is not None for field in [services_categories, services_description, rate_range, availability]):
@@ -326,6 +546,17 @@ class UserProfileSerializer(serializers.ModelSerializer):
                     'availability': availability if availability is not None else ''
                 }
             )
+
+        # Nested item lists: bulk statements per relation, no per-row signals
+        for name, items in nested.items():
+            apply_nested_writes(instance, name, items)
+        if nested:
+            from .signals import schedule_reindex  # signals imports this module
+            schedule_reindex(instance.pk)
+            changed_fields.append('profile_version')
+
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
         
         return instance
 
@@ -372,17 +603,51 @@ class ProfileShareSerializer(serializers.ModelSerializer):
         read_only_fields = ['share_token', 'expires_at']
 
 
-class PublicProfileSerializer(serializers.ModelSerializer):
+class PublicProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    EXPANDABLE_FIELDS = {
+        'experiences': ExperienceSerializer,
+        'certifications': CertificationSerializer,
+        'projects': ProjectSerializer,
+    }
+    FIELD_RELATIONS = {
+        'services_description': 'categories',
+        'rate_range': 'categories',
+        'availability': 'categories',
+    }
+
     experiences = ExperienceSerializer(many=True, read_only=True)
     certifications = CertificationSerializer(many=True, read_only=True)
     projects = ProjectSerializer(many=True, read_only=True)
     profile_pic_url = serializers.SerializerMethodField(read_only=True)
+    profile_pic_variants = serializers.SerializerMethodField(read_only=True)
     video_intro_url = serializers.SerializerMethodField(read_only=True)
+
+    # Service details live on the user's ServiceCategory, not on Users
+    services_description = serializers.SerializerMethodField(read_only=True)
+    rate_range = serializers.SerializerMethodField(read_only=True)
+    availability = serializers.SerializerMethodField(read_only=True)
+
+    def _service_category(self, obj):
+        categories = list(obj.categories.all())
+        return categories[0] if categories else None
+
+    def get_services_description(self, obj):
+        category = self._service_category(obj)
+        return category.services_description if category else ''
+
+    def get_rate_range(self, obj):
+        category = self._service_category(obj)
+        return category.rate_range if category else ''
+
+    def get_availability(self, obj):
+        category = self._service_category(obj)
+        return category.availability if category else ''
     
     def get_profile_pic_url(self, obj):
-        if obj.profile_pic:
-            return obj.profile_pic.url
-        return None
+        return image_url(obj, 'profile_pic', 'medium')
+
+    def get_profile_pic_variants(self, obj):
+        return image_variant_urls(obj, 'profile_pic')
     
     def get_video_intro_url(self, obj):
         if obj.video_intro:
@@ -396,6 +661,7 @@ class PublicProfileSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'profile_pic_url',
+            'profile_pic_variants',
             'rating',
             'subscription_type',
             'email',
@@ -417,3 +683,45 @@ class PublicProfileSerializer(serializers.ModelSerializer):
 
 
 
+
+
+class AnonymousProfileSerializer(PublicProfileSerializer):
+    """
+    PublicProfileSerializer for unauthenticated, edge-cached reads by
+    profile_url: the same profile without the contact details.
+    """
+    class Meta(PublicProfileSerializer.Meta):
+        fields = [name for name in PublicProfileSerializer.Meta.fields if name not in ('email', 'mobile')]
+
+
+class SearchCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Compact representation of a user on a search results page. Nested
+    collections are left out unless explicitly requested with expand=...
+    """
+    EXPANDABLE_FIELDS = {
+        'social_links': SocialLinkSerializer,
+        'experiences': ExperienceSerializer,
+        'certifications': CertificationSerializer,
+        'categories': ServiceCategorySerializer,
+        'projects': ProjectSerializer,
+    }
+
+    # Columns the card reads; search querysets load only these
+    COLUMNS = (
+        'id', 'first_name', 'last_name', 'profile_url', 'profile_pic', 'profile_pic_variants', 'rating',
+        'subscription_type', 'verification_percentage', 'primary_tools', 'technical_skills',
+    )
+
+    profile_pic_url = serializers.SerializerMethodField(read_only=True)
+
+    def get_profile_pic_url(self, obj):
+        # Cards show an avatar; the thumbnail is a fraction of the original's bytes
+        return image_url(obj, 'profile_pic', 'thumb')
+
+    class Meta:
+        model = Users
+        fields = (
+            'id', 'first_name', 'last_name', 'profile_url', 'profile_pic_url', 'rating',
+            'subscription_type', 'verification_percentage', 'primary_tools', 'technical_skills',
+        )
@@ -0,0 +1,200 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Users, ServiceCategory, Experience, Review, Certification, Project, SocialLink,
+)
+from .search import index_users, save_search_documents, bump_search_generation, DOCUMENT_PREFETCH
+from .autocomplete import update_user_suggestions, remove_user_suggestions
+from .skills import sync_user_skills
+from .images import schedule_image_processing, release_image_variants
+from .profiles import bump_profile_version, invalidate_profile_cache, schedule_edge_purge
+from .storage import note_replaced_files, release_replaced_files, release_files
+
+# Users columns copied into the inverted index or the search document;
+# saves touching only other columns (last_login, otp, ...) don't need a reindex.
+SEARCH_INDEXED_FIELDS = {
+    'first_name', 'last_name', 'bio', 'primary_tools', 'technical_skills', 'soft_skills',
+    'subscription_type', 'rating', 'review_count', 'verification_percentage',
+}
+
+# Related rows that feed the search index (Review and SocialLink don't)
+SEARCH_SOURCE_MODELS = (ServiceCategory, Experience, Certification, Project)
+
+
+def refresh_search_data(user_id):
+    """
+    Rebuild a user's search document, inverted-index postings, skill links
+    and search suggestions.
+    """
+    user = Users.objects.prefetch_related(*DOCUMENT_PREFETCH).filter(pk=user_id).first()
+    if user is None:
+        return
+    save_search_documents([user])
+    sync_user_skills(user)
+    index_users([user])
+    update_user_suggestions(user)
+
+
+def drop_cached_profile(user_id):
+    """
+    Drop a user's rendered profiles here and at the edge.
+    """
+    invalidate_profile_cache(user_id)
+    schedule_edge_purge(user_id)
+
+
+class PendingProfileChanges:
+    """
+    Follow-up work for the profiles written in one transaction. However many
+    of a user's rows a request saves, their profile version is bumped once
+    (inside the transaction); on commit their search data is rebuilt once,
+    their cached profile dropped once and the search generation bumped once.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        # Dicts used as ordered sets, so users are flushed in the order they were written
+        self.changed = {}
+        self.reindex = {}
+        # user_id -> savepoints open when its version was bumped
+        self.versioned = {}
+        if connection.in_atomic_block:
+            connection.pending_profile_changes = self
+
+    @classmethod
+    def current(cls, using=None):
+        connection = transaction.get_connection(using)
+        pending = getattr(connection, 'pending_profile_changes', None)
+        # A rollback discards the callbacks, and with them what was recorded
+        if pending is None or not any(entry[1] == pending.flush for entry in connection.run_on_commit):
+            pending = cls(connection)
+        return pending
+
+    def add(self, user_id, reindex=False, bump_version=False):
+        """
+        Record a write to a user's profile data. bump_version is for writes
+        that don't go through Users.save, which bumps the version itself.
+        """
+        self.changed[user_id] = None
+        if reindex:
+            self.reindex[user_id] = None
+        if bump_version:
+            savepoints = list(self.connection.savepoint_ids)
+            bumped_in = self.versioned.get(user_id)
+            # Bump again if the savepoint the last bump happened in was left
+            if bumped_in is None or savepoints[:len(bumped_in)] != bumped_in:
+                bump_profile_version(user_id)
+                self.versioned[user_id] = savepoints
+        if self.connection.in_atomic_block:
+            # Every write queues the flush, so rolling back a savepoint can't
+            # drop the only one; the first call does the work, later ones find none
+            transaction.on_commit(self.flush, using=self.connection.alias)
+        else:
+            # Autocommit: the write is already committed
+            self.flush()
+
+    def flush(self):
+        if getattr(self.connection, 'pending_profile_changes', None) is self:
+            self.connection.pending_profile_changes = None
+        reindex, self.reindex = self.reindex, {}
+        changed, self.changed = self.changed, {}
+        for user_id in reindex:
+            refresh_search_data(user_id)
+        if changed:
+            bump_search_generation()
+        for user_id in changed:
+            drop_cached_profile(user_id)
+
+
+def schedule_reindex(user_id):
+    PendingProfileChanges.current().add(user_id, reindex=True)
+
+
+@receiver(post_save, sender=Users)
+def record_user_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= Users.NON_PROFILE_FIELDS:
+        return
+    reindex = update_fields is None or bool(SEARCH_INDEXED_FIELDS.intersection(update_fields))
+    PendingProfileChanges.current().add(instance.pk, reindex=reindex)
+
+
+@receiver(post_delete, sender=Users)
+def record_user_delete(sender, instance, **kwargs):
+    PendingProfileChanges.current().add(instance.pk)
+
+
+@receiver(pre_delete, sender=Users)
+def drop_user_suggestions(sender, instance, **kwargs):
+    # Entries cascade away with the user, but the term weights need adjusting first
+    remove_user_suggestions(instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def refresh_review_stats_on_delete(sender, instance, **kwargs):
+    # Review.save keeps the summary current on create/edit; deletes need this
+    user = Users.objects.filter(pk=instance.user_id).first()
+    if user is not None:
+        user.refresh_review_stats()
+
+
+# Certification, Project and SocialLink only appear in expanded search
+# results, but a stale expansion is still a stale profile.
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Certification)
+@receiver(post_delete, sender=Certification)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=SocialLink)
+@receiver(post_delete, sender=SocialLink)
+def record_related_change(sender, instance, **kwargs):
+    PendingProfileChanges.current().add(
+        instance.user_id, reindex=sender in SEARCH_SOURCE_MODELS, bump_version=True,
+    )
+
+
+@receiver(post_save, sender=Users)
+def process_profile_pic(sender, instance, update_fields=None, **kwargs):
+    schedule_image_processing(instance, 'profile_pic', update_fields)
+
+
+@receiver(post_save, sender=Project)
+def process_project_image(sender, instance, update_fields=None, **kwargs):
+    schedule_image_processing(instance, 'project_image', update_fields)
+
+
+@receiver(post_save, sender=Certification)
+def process_certification_image(sender, instance, update_fields=None, **kwargs):
+    schedule_image_processing(instance, 'certifications_image', update_fields)
+
+
+# Media reference counting (api/storage.py): a row gives up its reference to a
+# file when the field is replaced or the row is deleted.
+IMAGE_FIELDS = {Users: 'profile_pic', Project: 'project_image', Certification: 'certifications_image'}
+
+
+@receiver(pre_save, sender=Users)
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Certification)
+def note_replaced_media(sender, instance, update_fields=None, **kwargs):
+    note_replaced_files(instance, update_fields)
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Certification)
+def release_replaced_media(sender, instance, **kwargs):
+    release_replaced_files(instance)
+
+
+@receiver(post_delete, sender=Users)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Certification)
+def release_deleted_media(sender, instance, **kwargs):
+    release_files(instance)
+    release_image_variants(instance, IMAGE_FIELDS[sender])
@@ -0,0 +1,79 @@
+"""
+Normalized skill taxonomy built from Users.primary_tools and
+Users.technical_skills, so skill filters are exact indexed joins instead of
+substring matches ("Java" no longer matches "JavaScript").
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Skill, UserSkill
+from .search import split_list_field
+
+SKILL_SOURCE_FIELDS = ('primary_tools', 'technical_skills')
+
+
+def skill_key(name):
+    return ' '.join(name.lower().split())[:100]
+
+
+def parse_skills(user):
+    """
+    {key: display name} for the skills listed on a user's profile.
+    """
+    skills = {}
+    for field in SKILL_SOURCE_FIELDS:
+        for name in split_list_field(getattr(user, field)):
+            skills.setdefault(skill_key(name), name)
+    return skills
+
+
+def ensure_skills(skills):
+    """
+    Create any missing Skill rows for a {key: name} mapping and return {key: id}.
+    """
+    if not skills:
+        return {}
+    Skill.objects.bulk_create(
+        [Skill(key=key, name=name) for key, name in skills.items()],
+        ignore_conflicts=True,
+    )
+    return dict(Skill.objects.filter(key__in=skills).values_list('key', 'id'))
+
+
+def sync_user_skills(user):
+    """
+    Make the user's UserSkill rows match their profile text.
+    """
+    wanted = set(ensure_skills(parse_skills(user)).values())
+    current = set(UserSkill.objects.filter(user_id=user.pk).values_list('skill_id', flat=True))
+
+    with transaction.atomic():
+        if current - wanted:
+            UserSkill.objects.filter(user_id=user.pk, skill_id__in=current - wanted).delete()
+        if wanted - current:
+            UserSkill.objects.bulk_create(
+                [UserSkill(user_id=user.pk, skill_id=skill_id) for skill_id in wanted - current],
+                ignore_conflicts=True,
+            )
+
+
+def users_with_skills(names, match_all=True):
+    """
+    Subquery of user ids having all (or any) of the given skills, answered
+    from the (skill, user) index.
+    """
+    keys = {skill_key(name) for name in names if name.strip()}
+    skill_ids = list(Skill.objects.filter(key__in=keys).values_list('id', flat=True))
+    if match_all and len(skill_ids) < len(keys):
+        # At least one requested skill doesn't exist anywhere
+        return UserSkill.objects.none().values('user_id')
+
+    user_skills = UserSkill.objects.filter(skill_id__in=skill_ids)
+    if match_all and len(skill_ids) > 1:
+        return (
+            user_skills.values('user_id')
+            .annotate(matched=Count('skill_id'))
+            .filter(matched=len(skill_ids))
+            .values('user_id')
+        )
+    return user_skills.values('user_id')
@@ -0,0 +1,198 @@
+"""
+Content-addressed media storage.
+
+ContentAddressedStorage keeps every upload once, named after the SHA-256 of
+its bytes inside its upload_to directory:
+
+    user_profiles_pic/3f/3fa2...c9.jpg
+
+Uploading the same picture again points at the existing file instead of
+writing a copy. MediaBlob counts the references to each file: save()
+acquires one, delete() releases one, and the file is removed once the last
+reference is gone and the transaction has committed. The receivers in
+api/signals.py release the files a row stops referring to when a file field
+is replaced or the row is deleted.
+
+Names that aren't content-addressed (media from before the
+migrate_media_storage command) are deleted the way FileSystemStorage
+deletes them.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+READ_BLOCK_SIZE = 64 * 1024
+
+# Uploads are hashed into here first; it shares MEDIA_ROOT's filesystem so
+# placing the blob is a rename
+STAGING_DIR = '.staging'
+
+CONTENT_NAME = re.compile(r'^(?:.+/)?[0-9a-f]{2}/[0-9a-f]{64}(?:\.[a-z0-9]{1,4})?$')
+# Also matches names derived from a blob's, such as the image pipeline's <blob>_thumb.jpg
+SHARDED_NAME = re.compile(r'^(?:(?P<prefix>.+)/)?[0-9a-f]{2}/[0-9a-f]{64}[^/]*$')
+EXTENSION = re.compile(r'^\.[a-z0-9]{1,4}$')
+
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_NAME.match(name))
+
+
+def content_name(name, digest):
+    """
+    Name of the blob with `digest` for an upload named `name`.
+    """
+    match = SHARDED_NAME.match(name)
+    prefix = match.group('prefix') if match else posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    if not EXTENSION.match(extension):
+        extension = ''
+    return posixpath.join(prefix or '', digest[:2], f'{digest}{extension}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    reference_counted = True
+
+    def get_available_name(self, name, max_length=None):
+        # _save names the file after its content
+        return name
+
+    def _save(self, name, content):
+        staged = None
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large uploads, finished chunked uploads): hash it in
+            # place and move it; uploads.PartFile carries the checksum it verified
+            source = content.temporary_file_path()
+            size = os.path.getsize(source)
+            digest = getattr(content, 'sha256', None)
+            if not digest:
+                hasher = hashlib.sha256()
+                with open(source, 'rb') as source_file:
+                    for block in iter(lambda: source_file.read(READ_BLOCK_SIZE), b''):
+                        hasher.update(block)
+                digest = hasher.hexdigest()
+        else:
+            # Hash while streaming into a staging file, so nothing is read twice
+            staging = os.path.join(self.location, STAGING_DIR)
+            os.makedirs(staging, exist_ok=True)
+            fd, staged = tempfile.mkstemp(dir=staging)
+            hasher, size = hashlib.sha256(), 0
+            with os.fdopen(fd, 'wb') as staged_file:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    staged_file.write(chunk)
+                    size += len(chunk)
+            source, digest = staged, hasher.hexdigest()
+
+        name = content_name(name, digest)
+        path = self.path(name)
+        try:
+            self._acquire(name, digest, size)
+            if os.path.exists(path):
+                # A reused blob counts as new for collect_orphaned_media's grace period
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                file_move_safe(source, path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        finally:
+            if staged and os.path.exists(staged):
+                os.remove(staged)
+        return name
+
+    def _acquire(self, name, digest, size):
+        from .models import MediaBlob
+        blobs = MediaBlob.objects.filter(name=name)
+        if blobs.update(ref_count=F('ref_count') + 1, updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, sha256=digest, size=size, ref_count=1)
+        except IntegrityError:
+            # Someone else stored the same content first
+            blobs.update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+
+    def delete(self, name):
+        """
+        Release one reference to `name`.
+        """
+        from .models import MediaBlob
+        if not is_content_addressed(name):
+            return super().delete(name)
+        MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        transaction.on_commit(lambda: self.reclaim(name))
+
+    def reclaim(self, name):
+        """
+        Remove the blob if nothing references it any more. Deleting the row
+        locks it, so a concurrent save of the same content waits and then
+        puts the file back.
+        """
+        from .models import MediaBlob
+        with transaction.atomic():
+            deleted, _ = MediaBlob.objects.filter(name=name, ref_count=0).delete()
+            if deleted:
+                super().delete(name)
+
+
+def release_file(storage, name):
+    """
+    Drop a row's reference to a stored file. Storages that don't count
+    references keep the file.
+    """
+    if name and getattr(storage, 'reference_counted', False):
+        storage.delete(name)
+
+
+def file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def stored_name(instance, field):
+    # Deferred fields aren't in __dict__; don't load them just to look
+    value = instance.__dict__.get(field.attname)
+    return getattr(value, 'name', value) or ''
+
+
+def note_replaced_files(instance, update_fields=None):
+    """
+    Before a save, remember the stored files it is about to replace.
+    """
+    instance._replaced_files = []
+    if instance._state.adding or instance.pk is None:
+        return
+    fields = [
+        field for field in file_fields(type(instance))
+        if field.attname in instance.__dict__ and (update_fields is None or field.name in update_fields)
+    ]
+    if not fields:
+        return
+    stored = type(instance)._base_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    if stored is None:
+        return
+    instance._replaced_files = [
+        (field.storage, stored[field.attname]) for field in fields
+        if stored[field.attname] and stored[field.attname] != stored_name(instance, field)
+    ]
+
+
+def release_replaced_files(instance):
+    for storage, name in getattr(instance, '_replaced_files', ()):
+        release_file(storage, name)
+    instance._replaced_files = []
+
+
+def release_files(instance):
+    """
+    Release every file a deleted row referred to.
+    """
+    for field in file_fields(type(instance)):
+        release_file(field.storage, stored_name(instance, field))
@@ -10,6 +10,9 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Written together whenever a payment activates a plan
+SUBSCRIPTION_FIELDS = ['subscription_type', 'subscription_active', 'subscription_start_date', 'subscription_end_date']
+
 
 class UpdateSubscriptionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -28,7 +31,7 @@ class UpdateSubscriptionView(APIView):
         
         user = request.user
         user.subscription_type = subscription_type
-        user.save()
+        user.save(update_fields=['subscription_type'])
         
         return Response({
             'message': 'Subscription updated successfully',
@@ -185,7 +188,7 @@ class GCashWebhookView(APIView):
                 user.subscription_active = True
                 user.subscription_start_date = timezone.now()
                 user.subscription_end_date = timezone.now() + timezone.timedelta(days=30)
-                user.save()
+                user.save(update_fields=SUBSCRIPTION_FIELDS)
                 
                 print(f"Updated subscription for user {user_id} to {subscription_type}")
                 return Response({'status': 'success'})
@@ -252,7 +255,7 @@ class VerifyPaymentView(APIView):
                 user.subscription_active = True
                 user.subscription_start_date = timezone.now()
                 user.subscription_end_date = timezone.now() + timezone.timedelta(days=30)
-                user.save()
+                user.save(update_fields=SUBSCRIPTION_FIELDS)
                 
                 print(f"Updated user subscription to: {user.subscription_type}")
                 
@@ -319,7 +322,7 @@ class VerifySubscriptionView(APIView):
                 user.subscription_active = True
                 user.subscription_start_date = timezone.now()
                 user.subscription_end_date = timezone.now() + timezone.timedelta(days=30)
-                user.save()
+                user.save(update_fields=SUBSCRIPTION_FIELDS)
                 
                 return Response({'success': True, 'status': 'activated'})
             else:
@@ -363,7 +366,7 @@ class PayMongoWebhookView(APIView):
                     user.subscription_active = True
                     user.subscription_start_date = timezone.now()
                     user.subscription_end_date = timezone.now() + timezone.timedelta(days=30)
-                    user.save()
+                    user.save(update_fields=SUBSCRIPTION_FIELDS)
                     print(f"Updated subscription for user {user_id} to {subscription_type}")
                 except User.DoesNotExist:
                     print(f"User {user_id} not found")
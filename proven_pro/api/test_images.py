@@ -0,0 +1,98 @@
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from PIL import Image
+from rest_framework.test import APIClient
+from api.images import process_image
+from api.models import Project
+from api.testing import TemporaryMediaRootMixin
+
+User = get_user_model()
+
+EXIF_ORIENTATION = 0x0112
+
+
+def jpeg_upload(name='photo.jpg', size=(3000, 2000), orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImagePipelineTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(email='pics@example.com', username='pics', password='testpass123')
+
+    def _upload_profile_pic(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile_pic = upload
+            self.user.save()
+        self.user.refresh_from_db()
+
+    def test_original_is_downscaled_and_exif_stripped(self):
+        self._upload_profile_pic(jpeg_upload(orientation=6))
+        with self.user.profile_pic.open('rb') as stored:
+            image = Image.open(stored)
+            # Orientation 6 (rotate 90) is applied to the pixels, not left in metadata
+            self.assertEqual(image.height, 2048)
+            self.assertLess(image.width, image.height)
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_variants_are_recorded(self):
+        self._upload_profile_pic(jpeg_upload())
+        variants = self.user.profile_pic_variants
+        self.assertEqual(variants['source'], self.user.profile_pic.name)
+        self.assertEqual((variants['sizes']['thumb']['width'], variants['sizes']['thumb']['height']), (96, 96))
+        self.assertEqual(variants['sizes']['small']['width'], 320)
+
+        storage = self.user.profile_pic.storage
+        with storage.open(variants['sizes']['medium']['webp'], 'rb') as webp:
+            self.assertEqual(Image.open(webp).format, 'WEBP')
+
+    def test_serializers_pick_size_appropriate_urls(self):
+        self._upload_profile_pic(jpeg_upload())
+        sizes = self.user.profile_pic_variants['sizes']
+
+        profile = APIClient()
+        profile.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        data = profile.get('/api/profile/').json()
+        self.assertTrue(data['profile_pic_url'].endswith(sizes['medium']['name']))
+        self.assertEqual(set(data['profile_pic_variants']), {'thumb', 'small', 'medium'})
+
+        card = APIClient().get('/api/search-profiles/').data['results'][0]
+        self.assertTrue(card['profile_pic_url'].endswith(sizes['thumb']['name']))
+
+    def test_original_url_until_processed(self):
+        self.user.profile_pic = jpeg_upload()
+        self.user.save()
+        data = APIClient().get(f'/api/p/{self.user.profile_url}/').json()
+        self.assertTrue(data['profile_pic_url'].endswith(self.user.profile_pic.name))
+        self.assertEqual(data['profile_pic_variants'], {})
+
+    @override_settings(CDN_PURGE_URL='https://cdn.example.com/purge', CDN_PURGE_WORKERS=0)
+    def test_processing_purges_edge_copies(self):
+        # Saved but not processed yet
+        self.user.profile_pic = jpeg_upload()
+        self.user.save()
+        with mock.patch('api.profiles.requests.post') as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                process_image(User, self.user.pk, 'profile_pic')
+        purge.assert_called_once_with(
+            f'https://cdn.example.com/purge/profile-{self.user.pk.hex}', headers=mock.ANY, timeout=5,
+        )
+
+    def test_project_images(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(user=self.user, project_title='Site', project_image=jpeg_upload('site.jpg'))
+        project.refresh_from_db()
+        self.assertIn('thumb', project.project_image_variants['sizes'])
@@ -0,0 +1,114 @@
+import os
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils.http import http_date
+from api.testing import TemporaryMediaRootMixin, VIDEO
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='')
+class MediaServingTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for name, data in (
+            ('videos/intro.mp4', VIDEO),
+            ('verification/gov_id/id.jpg', b'id'),
+            ('chunked_uploads/abc.part', b'part'),
+            ('videos/page.html', b'<script>alert(1)</script>'),
+        ):
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as media_file:
+                media_file.write(data)
+
+    def _get(self, path='videos/intro.mp4', **headers):
+        return self.client.get(f'/media/{path}', **headers)
+
+    def test_full_file(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), VIDEO)
+        self.assertEqual(response['Content-Length'], str(len(VIDEO)))
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+
+    def test_byte_range(self):
+        response = self._get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), VIDEO[100:200])
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(VIDEO)}')
+
+    def test_open_ended_and_suffix_ranges(self):
+        response = self._get(HTTP_RANGE='bytes=10000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), VIDEO[10000:])
+
+        response = self._get(HTTP_RANGE='bytes=-16')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), VIDEO[-16:])
+
+    def test_unsatisfiable_range(self):
+        response = self._get(HTTP_RANGE=f'bytes={len(VIDEO)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(VIDEO)}')
+
+    def test_range_past_the_end_of_the_file(self):
+        response = self._get(HTTP_RANGE=f'bytes={len(VIDEO) + 10}-{len(VIDEO) + 5}')
+        self.assertEqual(response.status_code, 416)
+
+    def test_active_content_is_downloaded(self):
+        response = self._get('videos/page.html')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="page.html"')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+        video = self._get()
+        self.assertEqual(video['Content-Disposition'], 'inline; filename="intro.mp4"')
+        self.assertEqual(video['X-Content-Type-Options'], 'nosniff')
+
+    def test_multiple_ranges_get_whole_file(self):
+        response = self._get(HTTP_RANGE='bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range_for_a_changed_file_gets_whole_file(self):
+        response = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        etag = self._get()['ETag']
+        response = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_conditional_get(self):
+        response = self._get()
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code, 200)
+
+    def test_private_paths_are_not_served(self):
+        self.assertEqual(self._get('chunked_uploads/abc.part').status_code, 404)
+        self.assertEqual(self._get('videos/../chunked_uploads/abc.part').status_code, 404)
+        self.assertEqual(self._get('verification/gov_id/id.jpg').status_code, 404)
+        self.assertEqual(self._get('../../etc/passwd').status_code, 404)
+        self.assertEqual(self._get('videos/missing.mp4').status_code, 404)
+
+    def test_staff_can_open_verification_documents(self):
+        staff = User.objects.create_user(email='staff@example.com', username='staff', password='testpass123')
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+
+        response = self._get('verification/gov_id/id.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/intro.mp4')
+        self.assertEqual(response.content, b'')
+        self.assertIn('attachment', self._get('videos/page.html')['Content-Disposition'])
+        self.assertEqual(self._get('chunked_uploads/abc.part').status_code, 404)
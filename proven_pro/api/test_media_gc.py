@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from api.models import ChunkedUpload, Project
+from api.test_images import jpeg_upload
+from api.testing import TemporaryMediaRootMixin
+
+User = get_user_model()
+
+LONG_AGO = time.time() - 30 * 86400
+
+
+class CollectOrphanedMediaTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='gc@example.com', username='gc', password='testpass123')
+
+    def _path(self, name):
+        return os.path.join(self.media_root, name)
+
+    def _write(self, name, data=b'orphan', mtime=LONG_AGO):
+        os.makedirs(os.path.dirname(self._path(name)), exist_ok=True)
+        with open(self._path(name), 'wb') as media_file:
+            media_file.write(data)
+        os.utime(self._path(name), (mtime, mtime))
+
+    def _age_everything(self):
+        for directory, _, filenames in os.walk(self.media_root):
+            for filename in filenames:
+                os.utime(os.path.join(directory, filename), (LONG_AGO, LONG_AGO))
+
+    def _collect(self, *args):
+        output = io.StringIO()
+        call_command('collect_orphaned_media', *args, stdout=output)
+        return output.getvalue()
+
+    def test_removes_old_orphans_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.video_intro = SimpleUploadedFile('intro.mp4', b'video')
+            self.user.save()
+        self._age_everything()
+        self._write('videos/replaced.mp4')
+        self._write('user_profiles_pic/just-uploaded.jpg', mtime=time.time())
+
+        output = self._collect()
+        self.assertFalse(os.path.exists(self._path('videos/replaced.mp4')))
+        self.assertTrue(os.path.exists(self._path('user_profiles_pic/just-uploaded.jpg')))
+        self.assertTrue(os.path.exists(self.user.video_intro.path))
+        self.assertIn('1 orphaned files, 6.0 B reclaimed', output)
+
+    def test_image_variants_are_references(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(user=self.user, project_title='Site', project_image=jpeg_upload())
+        project.refresh_from_db()
+        self._age_everything()
+
+        self._collect()
+        self.assertTrue(os.path.exists(project.project_image.path))
+        for size in project.project_image_variants['sizes'].values():
+            self.assertTrue(os.path.exists(self._path(size['name'])))
+            self.assertTrue(os.path.exists(self._path(size['webp'])))
+
+    def test_dry_run_and_quarantine(self):
+        self._write('videos/replaced.mp4')
+
+        output = self._collect('--dry-run')
+        self.assertIn('would be reclaimed', output)
+        self.assertTrue(os.path.exists(self._path('videos/replaced.mp4')))
+
+        self._collect('--quarantine')
+        self.assertFalse(os.path.exists(self._path('videos/replaced.mp4')))
+        self.assertTrue(os.path.exists(self._path('.quarantine/videos/replaced.mp4')))
+
+        # Quarantined files are purged once they have sat there for the grace period
+        self._collect('--purge-quarantine')
+        self.assertTrue(os.path.exists(self._path('.quarantine/videos/replaced.mp4')))
+        self._collect('--purge-quarantine', '--grace-days', '0')
+        self.assertFalse(os.path.exists(self._path('.quarantine/videos/replaced.mp4')))
+
+    def test_resumes_after_checkpoint(self):
+        self._write('videos/a.mp4')
+        self._write('videos/b.mp4')
+        with open(self._path('.media-gc-checkpoint.json'), 'w') as checkpoint:
+            json.dump({'after': 'videos/a.mp4', 'stats': {
+                'scanned': 1, 'scanned_bytes': 0, 'orphans': 0, 'reclaimed_bytes': 0, 'by_directory': {},
+            }}, checkpoint)
+
+        output = self._collect('--batch-size', '1')
+        self.assertIn('Resuming after videos/a.mp4', output)
+        self.assertTrue(os.path.exists(self._path('videos/a.mp4')))
+        self.assertFalse(os.path.exists(self._path('videos/b.mp4')))
+        self.assertFalse(os.path.exists(self._path('.media-gc-checkpoint.json')))
+
+    def test_expires_abandoned_chunked_uploads(self):
+        upload = ChunkedUpload.objects.create(user=self.user, filename='intro.mp4', size=100)
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now() - timezone.timedelta(days=30))
+        self._write(f'chunked_uploads/{upload.pk}.part')
+        active = ChunkedUpload.objects.create(user=self.user, filename='intro.mp4', size=100)
+        self._write(f'chunked_uploads/{active.pk}.part')
+
+        self._collect()
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(os.path.exists(self._path(f'chunked_uploads/{upload.pk}.part')))
+        self.assertTrue(os.path.exists(self._path(f'chunked_uploads/{active.pk}.part')))
@@ -0,0 +1,508 @@
+import datetime
+import uuid
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import SocialLink, Experience, Certification, ServiceCategory, Project, Review, ProfileShare
+from api.profiles import purge_profile_edge_cache, schedule_edge_purge
+
+User = get_user_model()
+
+# 5 prefetches (social_links, experiences, certifications, categories,
+# projects). The JWT user lookup adds one more in production;
+# force_authenticate skips it here.
+OWNER_PROFILE_QUERIES = 5
+
+
+PLATFORMS = ['linkedin', 'github', 'twitter', 'facebook', 'instagram', 'other']
+
+
+def add_related_rows(user, count):
+    for index in range(count):
+        SocialLink.objects.create(user=user, platform=PLATFORMS[index], url=f'https://example.com/{index}')
+        Experience.objects.create(user=user, company_name=f'Company {index}', position='Developer')
+        Certification.objects.create(
+            user=user, certifications_name=f'Cert {index}', certifications_issuer='Issuer',
+            certifications_issued_date=datetime.date(2020, 1, 1),
+        )
+        ServiceCategory.objects.create(user=user, services_categories=f'Category {index}')
+        Project.objects.create(user=user, project_title=f'Project {index}')
+        Review.objects.create(user=user, reviewer_name=f'Client {index}', rating=5, comment='Great')
+
+
+class ProfileReadQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _authenticate(self, email):
+        # A fresh instance per request, as the JWT authenticator would load;
+        # loaded here so the lookup stays out of the query budget
+        self.client.force_authenticate(user=User.objects.get(email=email))
+
+    def _get_profile(self, email):
+        self._authenticate(email)
+        return self.client.get('/api/profile/')
+
+    def test_empty_profile(self):
+        User.objects.create_user(email='empty@example.com', username='empty', password='testpass123')
+        self._authenticate('empty@example.com')
+        with self.assertNumQueries(OWNER_PROFILE_QUERIES):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_query_count_does_not_grow_with_related_rows(self):
+        user = User.objects.create_user(email='busy@example.com', username='busy', password='testpass123')
+        add_related_rows(user, 5)
+        self._authenticate('busy@example.com')
+        with self.assertNumQueries(OWNER_PROFILE_QUERIES):
+            response = self.client.get('/api/profile/')
+        data = response.json()
+        self.assertEqual(len(data['experiences']), 5)
+        self.assertEqual(len(data['social_links']), 5)
+        self.assertEqual(data['review_summary'], {'count': 5, 'average': 5.0})
+        self.assertNotIn('client_reviews', data)
+
+    def test_related_collections_are_ordered(self):
+        user = User.objects.create_user(email='ordered@example.com', username='ordered', password='testpass123')
+        add_related_rows(user, 3)
+        data = self._get_profile('ordered@example.com').json()
+        self.assertEqual(
+            [experience['company_name'] for experience in data['experiences']],
+            ['Company 0', 'Company 1', 'Company 2']
+        )
+
+
+class ReviewPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='reviewed@example.com', username='reviewed', password='testpass123')
+        for index in range(5):
+            Review.objects.create(user=self.user, reviewer_name=f'Client {index}', rating=index % 5 + 1, comment='Ok')
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+    def test_reviews_are_paginated_newest_first(self):
+        first = self.client.get('/api/get_reviews/', {'page_size': 3}).json()
+        self.assertEqual([review['reviewer_name'] for review in first['results']], ['Client 4', 'Client 3', 'Client 2'])
+        self.assertEqual(first['summary'], {'count': 5, 'average': 3.0})
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual([review['reviewer_name'] for review in second['results']], ['Client 1', 'Client 0'])
+        self.assertIsNone(second['next'])
+
+    def test_page_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/get_reviews/', {'page_size': 2})
+
+    def test_deleting_a_review_updates_the_summary(self):
+        Review.objects.filter(reviewer_name='Client 4').get().delete()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.review_count, self.user.rating), (4, 2.5))
+
+
+class ProfileConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='etag@example.com', username='etag', password='testpass123')
+        self.share = ProfileShare.objects.create(
+            user=self.user, recipient_email='client@example.com',
+            expires_at=timezone.now() + datetime.timedelta(days=7),
+        )
+
+    def _get(self, url, **headers):
+        # A fresh instance per request, as the JWT authenticator would load
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        return self.client.get(url, **headers)
+
+    def test_matching_etag_returns_304_without_loading_relations(self):
+        etag = self._get('/api/profile/')['ETag']
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_related_write_changes_etag(self):
+        etag = self._get('/api/profile/')['ETag']
+        Experience.objects.create(user=self.user, company_name='Acme', position='Developer')
+        response = self._get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_login_does_not_change_etag(self):
+        etag = self._get('/api/profile/')['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        response = self._get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_shared_profile_supports_if_none_match(self):
+        url = f'/api/verify-share/{self.share.share_token}/'
+        first = self._get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+        response = self._get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ProfileJSONCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='cache@example.com', username='cache', password='testpass123')
+        add_related_rows(self.user, 2)
+
+    def _get(self, url):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        return self.client.get(url)
+
+    def test_cache_hit_skips_orm_and_serializer(self):
+        first = self._get('/api/profile/')
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/profile/')
+        self.assertEqual(first.content, second.content)
+
+    def test_related_write_invalidates(self):
+        self._get('/api/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(user=self.user, project_title='Fresh project')
+        titles = [project['project_title'] for project in self._get('/api/profile/').json()['projects']]
+        self.assertIn('Fresh project', titles)
+
+    def test_public_representation_is_spliced_into_share_envelope(self):
+        share = ProfileShare.objects.create(
+            user=self.user, recipient_email='client@example.com',
+            expires_at=timezone.now() + datetime.timedelta(days=7),
+        )
+        data = self._get(f'/api/verify-share/{share.share_token}/').json()
+        self.assertEqual(data['share_token'], str(share.share_token))
+        self.assertEqual(len(data['profile']['experiences']), 2)
+        self.assertNotIn('client_reviews', data['profile'])
+
+
+class ProfileSparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='sparse@example.com', username='sparse', password='testpass123', first_name='Sparse',
+        )
+        add_related_rows(self.user, 2)
+
+    def _get(self, url, params=None):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        return self.client.get(url, params)
+
+    def test_scalar_fields_skip_every_relation(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/', {'fields': 'id,first_name'})
+        self.assertEqual(set(response.json()), {'id', 'first_name'})
+
+    def test_only_requested_relations_are_queried(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/', {'fields': 'first_name,experiences'})
+        data = response.json()
+        self.assertEqual(set(data), {'first_name', 'experiences'})
+        self.assertEqual(len(data['experiences']), 2)
+
+    def test_expand_adds_relations_to_scalars(self):
+        data = self._get('/api/profile/', {'expand': 'projects'}).json()
+        self.assertIn('bio', data)
+        self.assertEqual(len(data['projects']), 2)
+        self.assertNotIn('experiences', data)
+
+    def test_default_payload_is_unchanged(self):
+        data = self._get('/api/profile/').json()
+        self.assertEqual(len(data['social_links']), 2)
+        self.assertIn('gov_id_verified', data)
+
+    def test_each_selection_has_its_own_etag(self):
+        full = self._get('/api/profile/')
+        sparse = self._get('/api/profile/', {'fields': 'id'})
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+
+    def test_unknown_names_are_rejected(self):
+        self.assertEqual(self._get('/api/profile/', {'fields': 'password'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._get('/api/profile/', {'expand': 'bio'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_share_endpoint_supports_fields(self):
+        share = ProfileShare.objects.create(
+            user=self.user, recipient_email='client@example.com',
+            expires_at=timezone.now() + datetime.timedelta(days=7),
+        )
+        data = self._get(f'/api/verify-share/{share.share_token}/', {'fields': 'first_name,rate_range'}).json()
+        self.assertEqual(data['profile'], {'first_name': 'Sparse', 'rate_range': ''})
+
+
+class PublicProfileBySlugTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='slug@example.com', username='slug', password='testpass123', first_name='Slug', mobile='555',
+        )
+        add_related_rows(self.user, 2)
+        self.url = f'/api/p/{self.user.profile_url}/'
+
+    def test_anonymous_read_without_contact_details(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['first_name'], 'Slug')
+        self.assertEqual(len(data['experiences']), 2)
+        self.assertNotIn('email', data)
+        self.assertNotIn('mobile', data)
+
+    def test_edge_cache_headers(self):
+        response = self.client.get(self.url)
+        self.assertIn('s-maxage=', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=', response['Cache-Control'])
+        self.assertIn(f'profile-{self.user.pk.hex}', response['Surrogate-Key'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('s-maxage=', not_modified['Cache-Control'])
+
+    def test_cache_hit_is_a_single_lookup(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_unknown_slug(self):
+        self.assertEqual(self.client.get('/api/p/missing/').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(CDN_PURGE_URL='https://cdn.example.com/purge', CDN_PURGE_WORKERS=0)
+    def test_write_purges_local_and_edge_copies(self):
+        self.client.get(self.url)
+        with mock.patch('api.profiles.requests.post') as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                Experience.objects.create(user=self.user, company_name='Fresh Co', position='Lead')
+        purge.assert_called_with(
+            f'https://cdn.example.com/purge/profile-{self.user.pk.hex}', headers=mock.ANY, timeout=5,
+        )
+        companies = [experience['company_name'] for experience in self.client.get(self.url).json()['experiences']]
+        self.assertIn('Fresh Co', companies)
+
+
+class PublicProfileBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            user=User.objects.create_user(email='agency@example.com', username='agency', password='testpass123')
+        )
+        self.users = []
+        for index in range(6):
+            user = User.objects.create_user(
+                email=f'batch{index}@example.com', username=f'batch{index}', password='testpass123',
+                first_name=f'Batch{index}',
+            )
+            add_related_rows(user, 2)
+            self.users.append(user)
+
+    def _post(self, payload, params=''):
+        return self.client.post(f'/api/profiles/batch/{params}', payload, format='json')
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        # 1 user query + 4 grouped prefetches
+        with self.assertNumQueries(5):
+            self._post({'ids': [str(user.pk) for user in self.users[:2]]})
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self._post({'ids': [str(user.pk) for user in self.users]})
+        self.assertEqual(len(response.json()['results']), 6)
+
+    def test_cached_profiles_only_cost_the_user_query(self):
+        payload = {'ids': [str(user.pk) for user in self.users]}
+        self._post(payload)
+        with self.assertNumQueries(1):
+            self._post(payload)
+
+    def test_ids_and_slugs_in_request_order(self):
+        response = self._post({
+            'ids': [str(self.users[2].pk), str(uuid.uuid4())],
+            'profile_urls': [self.users[0].profile_url, 'missing', self.users[2].profile_url],
+        })
+        data = response.json()
+        self.assertEqual([profile['first_name'] for profile in data['results']], ['Batch2', 'Batch0'])
+        self.assertEqual(len(data['missing']), 2)
+        self.assertIn('missing', data['missing'])
+
+    def test_contact_details_are_left_out(self):
+        response = self._post({'ids': [str(self.users[0].pk)], 'profile_urls': [self.users[1].profile_url]})
+        for profile in response.json()['results']:
+            self.assertNotIn('email', profile)
+            self.assertNotIn('mobile', profile)
+
+    def test_contact_fields_cannot_be_selected(self):
+        response = self._post({'ids': [str(self.users[0].pk)]}, '?fields=id,email')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fields_apply_to_every_profile(self):
+        with self.assertNumQueries(1):
+            response = self._post({'ids': [str(user.pk) for user in self.users]}, '?fields=id,first_name')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'first_name'})
+
+    @override_settings(PROFILE_BATCH_MAX_SIZE=3)
+    def test_batch_size_is_capped(self):
+        response = self._post({'ids': [str(user.pk) for user in self.users]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self._post({'ids': ['nope']}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post({'ids': 'nope'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_body_must_be_an_object(self):
+        self.assertEqual(self._post([str(self.users[0].pk)]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post('nope').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProfileWriteFollowUpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(email='follow@example.com', username='follow', password='testpass123')
+
+    def test_work_runs_once_per_user_per_transaction(self):
+        with mock.patch('api.signals.refresh_search_data') as reindex, \
+                mock.patch('api.signals.bump_search_generation') as bump_generation, \
+                mock.patch('api.signals.drop_cached_profile') as drop:
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    Experience.objects.create(user=self.user, company_name='Acme', position='Developer')
+                    Project.objects.create(user=self.user, project_title='Site')
+                    SocialLink.objects.create(user=self.user, platform='github', url='https://github.com/follow')
+
+        reindex.assert_called_once_with(self.user.pk)
+        bump_generation.assert_called_once_with()
+        drop.assert_called_once_with(self.user.pk)
+        table = User._meta.db_table
+        version_bumps = [query for query in queries.captured_queries if query['sql'].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(version_bumps), 1)
+
+    def test_non_profile_saves_skip_the_work(self):
+        version = self.user.profile_version
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.otp = '123456'
+            self.user.save(update_fields=['otp'])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile_version, version)
+
+    @override_settings(CDN_PURGE_URL='https://cdn.example.com/purge', CDN_PURGE_WORKERS=1)
+    def test_edge_purge_runs_on_a_worker(self):
+        with mock.patch('api.profiles.purge_executor') as executor, mock.patch('api.profiles.requests.post') as purge:
+            schedule_edge_purge(self.user.pk)
+        executor.return_value.submit.assert_called_once_with(purge_profile_edge_cache, self.user.pk)
+        purge.assert_not_called()
+
+
+class ProfileUpdateWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='writer@example.com', username='writer', password='testpass123', first_name='Old', bio='Bio',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _user_updates(self, queries):
+        table = User._meta.db_table
+        return [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]
+
+    def test_only_changed_columns_are_written_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/profile/', {'first_name': 'New', 'bio': 'Bio'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        updates = self._user_updates(queries.captured_queries)
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"first_name"', updates[0])
+        self.assertNotIn('"bio"', updates[0])
+        self.assertNotIn('"password"', updates[0])
+
+    def test_unchanged_profile_is_not_saved(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/profile/', {'first_name': 'Old'}, format='json')
+        self.assertEqual(self._user_updates(queries.captured_queries), [])
+
+    def test_social_links_are_upserted(self):
+        self.client.post('/api/profile/', {
+            'linkedin': 'https://linkedin.com/in/old', 'twitter': 'https://twitter.com/old',
+        }, format='json')
+        version = User.objects.get(pk=self.user.pk).profile_version
+
+        self.client.post('/api/profile/', {'linkedin': 'https://linkedin.com/in/new'}, format='json')
+        links = dict(SocialLink.objects.filter(user=self.user).values_list('platform', 'url'))
+        self.assertEqual(links, {'linkedin': 'https://linkedin.com/in/new', 'twitter': 'https://twitter.com/old'})
+        self.assertGreater(User.objects.get(pk=self.user.pk).profile_version, version)
+
+
+class ProfileNestedWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='nested@example.com', username='nested', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_update_and_delete_in_one_request(self):
+        keep = Experience.objects.create(user=self.user, company_name='Keep', position='Dev')
+        drop = Experience.objects.create(user=self.user, company_name='Drop', position='Dev')
+
+        response = self.client.post('/api/profile/', {
+            'experiences': [
+                {'id': keep.id, 'position': 'Lead'},
+                {'id': drop.id, 'delete': True},
+            ] + [{'company_name': f'New {index}', 'position': 'Dev'} for index in range(3)],
+            'projects': [{'project_title': 'Portfolio'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        experiences = dict(Experience.objects.filter(user=self.user).values_list('company_name', 'position'))
+        self.assertEqual(experiences, {'Keep': 'Lead', 'New 0': 'Dev', 'New 1': 'Dev', 'New 2': 'Dev'})
+        self.assertEqual(list(Project.objects.filter(user=self.user).values_list('project_title', flat=True)), ['Portfolio'])
+
+    def test_rows_are_written_in_bulk(self):
+        items = [{'company_name': f'Company {index}', 'position': 'Dev'} for index in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/profile/', {'experiences': items}, format='json')
+        table = Experience._meta.db_table
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith(f'INSERT INTO "{table}"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Experience.objects.filter(user=self.user).count(), 10)
+
+    def test_profile_is_marked_changed(self):
+        version = User.objects.get(pk=self.user.pk).profile_version
+        self.client.post('/api/profile/', {'certifications': [{
+            'certifications_name': 'AWS', 'certifications_issuer': 'Amazon', 'certifications_issued_date': '2023-01-01',
+        }]}, format='json')
+        self.assertGreater(User.objects.get(pk=self.user.pk).profile_version, version)
+
+    def test_other_users_rows_cannot_be_touched(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='testpass123')
+        foreign = Experience.objects.create(user=other, company_name='Theirs', position='Dev')
+        response = self.client.post('/api/profile/', {'experiences': [{'id': foreign.id, 'delete': True}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Experience.objects.filter(pk=foreign.pk).exists())
+
+    def test_new_items_need_required_fields(self):
+        response = self.client.post('/api/profile/', {'experiences': [{'position': 'Dev'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PROFILE_NESTED_WRITE_MAX_ITEMS=2)
+    def test_item_count_is_capped(self):
+        items = [{'company_name': f'Company {index}', 'position': 'Dev'} for index in range(3)]
+        response = self.client.post('/api/profile/', {'experiences': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Experience.objects.filter(user=self.user).exists())
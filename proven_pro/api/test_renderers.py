@@ -0,0 +1,40 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONParser, ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_output_matches_stock_renderer(self):
+        data = {
+            'id': uuid.uuid4(),
+            'created_at': datetime.datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'issued': datetime.date(2020, 1, 1),
+            'rate_min': Decimal('20.50'),
+            'bio': 'Café \u2028 line',
+            'experiences': [{'id': 1, 'company_name': 'Acme'}],
+            1: 'non-string key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_from_accept_header(self):
+        body = ORJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(body, b'{\n  "a": 1\n}')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def test_parses_json(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(b'{"ids": ["a", "b"]}')), {'ids': ['a', 'b']})
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"ids": '))
@@ -0,0 +1,467 @@
+import io
+import uuid
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.core.cache import cache
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import SearchPosting, ServiceCategory, Experience, ProfileSearchDocument, Review, Skill, UserSkill
+from api.pagination import KeysetPagination
+from api.search import tokenize, search_profiles
+
+User = get_user_model()
+
+
+class TokenizeTests(TestCase):
+    def test_lowercases_and_drops_stop_words(self):
+        self.assertEqual(tokenize("Python and the Django REST"), ['python', 'django', 'rest'])
+
+    def test_keeps_language_names(self):
+        self.assertEqual(tokenize("C++, C#, Node.js"), ['c++', 'c#', 'node.js'])
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice = User.objects.create_user(
+                email='alice@example.com', username='alice', password='testpass123',
+                first_name='Alice', last_name='Python', technical_skills='python, django',
+            )
+            self.bob = User.objects.create_user(
+                email='bob@example.com', username='bob', password='testpass123',
+                first_name='Bob', last_name='Smith', bio='I sometimes write python scripts',
+            )
+            self.carol = User.objects.create_user(
+                email='carol@example.com', username='carol', password='testpass123',
+                first_name='Carol', last_name='Jones', bio='Graphic designer',
+            )
+
+    def test_profile_save_indexes_terms(self):
+        self.assertTrue(SearchPosting.objects.filter(user=self.alice, term='django').exists())
+
+    def test_related_model_changes_are_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceCategory.objects.create(user=self.carol, services_categories='Logo design')
+        self.assertEqual([user_id for user_id, _ in search_profiles('logo')], [self.carol.id])
+
+    def test_ranks_stronger_matches_first(self):
+        ranked = [user_id for user_id, _ in search_profiles('python')]
+        self.assertEqual(ranked, [self.alice.id, self.bob.id])
+
+    def test_last_term_matches_prefix(self):
+        ranked = [user_id for user_id, _ in search_profiles('desig')]
+        self.assertEqual(ranked, [self.carol.id])
+
+    def test_search_endpoint_uses_index(self):
+        response = self.client.get('/api/search-profiles/', {'q': 'python'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [str(self.alice.id), str(self.bob.id)]
+        )
+        self.assertFalse(response.data['truncated'])
+
+    def test_stop_word_only_query_matches_nothing(self):
+        self.assertEqual(len(self.client.get('/api/search-profiles/').data['results']), 3)
+        response = self.client.get('/api/search-profiles/', {'q': 'the'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_capped_candidates_are_reported(self):
+        with self.settings(SEARCH_MAX_CANDIDATES=1):
+            response = self.client.get('/api/search-profiles/', {'q': 'python'})
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.alice.id)])
+        self.assertTrue(response.data['truncated'])
+
+
+class SearchPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for index, rating in enumerate([4.5, 4.5, 3.0, 5.0, 4.5]):
+            User.objects.create_user(
+                email=f'user{index}@example.com', username=f'user{index}', password='testpass123',
+                first_name=f'User{index}', rating=rating,
+            )
+
+    def _walk(self, params):
+        seen = []
+        url = '/api/search-profiles/'
+        while url:
+            response = self.client.get(url, params if url == '/api/search-profiles/' else None)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_rating_cursor_walks_every_row_once_in_order(self):
+        expected = [
+            str(user.id) for user in User.objects.order_by('-rating', '-id')
+        ]
+        self.assertEqual(self._walk({'sort_by': 'rating', 'page_size': 2}), expected)
+
+    def test_first_name_cursor(self):
+        expected = [
+            str(user.id) for user in User.objects.order_by('first_name', 'id')
+        ]
+        self.assertEqual(self._walk({'sort_by': 'first_name', 'page_size': 2}), expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/search-profiles/', {'sort_by': 'rating', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_is_rejected(self):
+        encode = KeysetPagination(('-rating', '-id')).encode_cursor
+        tampered = (['x', {'a': 1}], [[4.5], str(uuid.uuid4())], [True, str(uuid.uuid4())], ['high', 'not-a-uuid'])
+        for position in tampered:
+            response = self.client.get('/api/search-profiles/', {'sort_by': 'rating', 'cursor': encode(position)})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+
+class SearchCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for index in range(5):
+            user = User.objects.create_user(
+                email=f'card{index}@example.com', username=f'card{index}', password='testpass123',
+                first_name=f'Card{index}',
+            )
+            Experience.objects.create(user=user, company_name='Acme', position='Developer')
+
+    def test_page_is_a_single_query(self):
+        # facet aggregate + page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/search-profiles/')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertNotIn('experiences', response.data['results'][0])
+
+    def test_expand_adds_one_query_per_relation(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/search-profiles/', {'expand': 'experiences,categories'})
+        self.assertEqual(response.data['results'][0]['experiences'][0]['company_name'], 'Acme')
+        self.assertEqual(response.data['results'][0]['categories'], [])
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get('/api/search-profiles/', {'expand': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fields_limit_card_columns(self):
+        response = self.client.get('/api/search-profiles/', {'fields': 'id,first_name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'first_name'})
+
+    def test_relation_named_in_fields_is_loaded(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/search-profiles/', {'fields': 'id,experiences'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'experiences'})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/search-profiles/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        User.objects.create_user(
+            email='f1@example.com', username='f1', password='testpass123',
+            subscription_type='premium', rating=4.5, gov_id_verified=True, mobile_verified=True,
+        )
+        User.objects.create_user(
+            email='f2@example.com', username='f2', password='testpass123', rating=3.2,
+        )
+        User.objects.create_user(
+            email='f3@example.com', username='f3', password='testpass123', rating=5,
+        )
+
+    def test_facets_cover_the_whole_result_set_in_one_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/search-profiles/', {'page_size': 1})
+        facets = response.data['facets']
+        self.assertEqual(facets['subscription_type'], {'free': 2, 'standard': 0, 'premium': 1})
+        self.assertEqual(facets['verification_level']['75'], 1)
+        self.assertEqual(facets['verification_level']['0'], 2)
+        self.assertEqual(facets['rating']['4-5'], 2)
+        self.assertEqual(facets['rating']['3-4'], 1)
+
+    def test_facets_are_cached_per_normalized_query(self):
+        self.client.get('/api/search-profiles/', {'sort_by': 'rating'})
+        with self.assertNumQueries(1):
+            self.client.get('/api/search-profiles/', {'sort_by': 'first_name'})
+
+
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='cached@example.com', username='cached', password='testpass123', first_name='Cached',
+        )
+
+    def test_equivalent_queries_share_a_cache_entry(self):
+        self.client.get('/api/search-profiles/', {'q': 'Cached', 'sort_by': 'rating'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/search-profiles/', {'q': '  the cached ', 'sort_by': 'rating'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_write_invalidates_results(self):
+        self.client.get('/api/search-profiles/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        response = self.client.get('/api/search-profiles/')
+        self.assertEqual(response.data['results'][0]['first_name'], 'Renamed')
+
+    def test_last_login_update_keeps_cache(self):
+        self.client.get('/api/search-profiles/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get('/api/search-profiles/')
+
+
+class SearchSuggestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.john = User.objects.create_user(
+                email='john@example.com', username='john', password='testpass123',
+                first_name='John', last_name='Smith', primary_tools='Python, Django',
+            )
+            User.objects.create_user(
+                email='jane@example.com', username='jane', password='testpass123',
+                first_name='Jane', last_name='Doe', technical_skills='python; PyTorch',
+            )
+
+    def _suggest(self, q, **params):
+        response = self.client.get('/api/search-suggestions/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['suggestions']
+
+    def test_most_used_skill_comes_first(self):
+        self.assertEqual(self._suggest('py')[0], {'text': 'Python', 'type': 'skill'})
+
+    def test_display_spelling_does_not_depend_on_index_order(self):
+        for name, skills in (('ann', 'fastapi'), ('bob', 'FastAPI')):
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create_user(
+                    email=f'{name}@example.com', username=name, password='testpass123',
+                    technical_skills=skills,
+                )
+        self.assertEqual(self._suggest('fast'), [{'text': 'FastAPI', 'type': 'skill'}])
+
+    def test_last_name_prefix_finds_full_name(self):
+        self.assertEqual(self._suggest('smi'), [{'text': 'John Smith', 'type': 'name'}])
+
+    def test_limit_is_capped(self):
+        self.assertEqual(len(self._suggest('py', limit=1)), 1)
+        self.assertLessEqual(len(self._suggest('py', limit=1000)), 10)
+
+    def test_short_prefix_returns_nothing(self):
+        self.assertEqual(self._suggest('p'), [])
+
+    def test_profile_edit_updates_suggestions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.john.primary_tools = 'Rust'
+            self.john.save()
+        cache.clear()
+        self.assertEqual(self._suggest('dja'), [])
+        self.assertEqual(self._suggest('ru'), [{'text': 'Rust', 'type': 'skill'}])
+
+
+class SearchDocumentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(
+                email='doc@example.com', username='doc', password='testpass123',
+                primary_tools='Figma', subscription_type='premium',
+            )
+            Experience.objects.create(user=self.user, company_name='Acme', position='Product Designer')
+
+    def test_document_follows_related_models(self):
+        document = ProfileSearchDocument.objects.get(user=self.user)
+        self.assertEqual(document.positions, 'Product Designer')
+        self.assertEqual(document.companies, 'Acme')
+        self.assertEqual(document.subscription_type, 'premium')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.experiences.all().delete()
+        document.refresh_from_db()
+        self.assertEqual(document.positions, '')
+
+    def test_job_title_filter_uses_document(self):
+        response = self.client.get('/api/search-profiles/', {'job_title': 'designer'})
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.user.id)])
+        response = self.client.get('/api/search-profiles/', {'job_title': 'plumber'})
+        self.assertEqual(response.data['results'], [])
+
+
+class RateFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, rate_range in [('cheap', '$10-15/hr'), ('mid', '$20-40/hr'), ('pricey', '$80/hr'), ('none', 'ask me')]:
+                user = User.objects.create_user(
+                    email=f'{name}@example.com', username=name, password='testpass123',
+                )
+                ServiceCategory.objects.create(user=user, rate_range=rate_range)
+                self.users[name] = str(user.id)
+
+    def _ids(self, params):
+        response = self.client.get('/api/search-profiles/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_rate_range_is_parsed_on_save(self):
+        category = ServiceCategory.objects.get(user_id=self.users['mid'])
+        self.assertEqual((category.rate_min, category.rate_max), (20, 40))
+        self.assertEqual((category.rate_currency, category.rate_unit), ('USD', 'hour'))
+
+    def test_range_filter_matches_overlapping_rates(self):
+        self.assertEqual(
+            set(self._ids({'rate_min': 12, 'rate_max': 30})),
+            {self.users['cheap'], self.users['mid']}
+        )
+
+    def test_sort_by_rate_with_cursor(self):
+        first = self.client.get('/api/search-profiles/', {'sort_by': 'rate', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+        ids = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [self.users['cheap'], self.users['mid'], self.users['pricey']])
+
+    def test_invalid_rate_is_rejected(self):
+        response = self.client.get('/api/search-profiles/', {'rate_min': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SkillFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.java = self._user('java', primary_tools='Java, Spring')
+        self.js = self._user('js', technical_skills='JavaScript, Django')
+        self.both = self._user('both', primary_tools='Java', technical_skills='Django')
+
+    def _user(self, name, **skills):
+        user = User.objects.create_user(email=f'{name}@example.com', username=name, password='testpass123')
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/profile/', skills, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=None)
+        return str(user.id)
+
+    def _ids(self, params):
+        response = self.client.get('/api/search-profiles/', params)
+        return {row['id'] for row in response.data['results']}
+
+    def test_profile_update_populates_taxonomy(self):
+        self.assertEqual(UserSkill.objects.filter(user_id=self.java).count(), 2)
+        self.assertTrue(Skill.objects.filter(key='javascript').exists())
+
+    def test_exact_match_does_not_match_longer_names(self):
+        self.assertEqual(self._ids({'skills': 'java'}), {self.java, self.both})
+
+    def test_all_semantics(self):
+        self.assertEqual(self._ids({'skills': 'Java,django'}), {self.both})
+
+    def test_any_semantics(self):
+        self.assertEqual(
+            self._ids({'skills': 'java,django', 'skills_match': 'any'}),
+            {self.java, self.js, self.both}
+        )
+
+    def test_unknown_skill_matches_nobody(self):
+        self.assertEqual(self._ids({'skills': 'java,cobol'}), set())
+
+
+class RelevanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plain = User.objects.create_user(
+                email='plain@example.com', username='plain', password='testpass123',
+                first_name='Plain', bio='python developer',
+            )
+            self.trusted = User.objects.create_user(
+                email='trusted@example.com', username='trusted', password='testpass123',
+                first_name='Trusted', bio='python developer', rating=5, review_count=40,
+                gov_id_verified=True, address_verified=True, mobile_verified=True,
+                subscription_type='premium',
+            )
+            self.unrelated = User.objects.create_user(
+                email='other@example.com', username='other', password='testpass123',
+                first_name='Other', bio='gardener', rating=5,
+            )
+
+    def _ids(self, params):
+        response = self.client.get('/api/search-profiles/', params)
+        return [row['id'] for row in response.data['results']]
+
+    def test_quality_signals_break_text_ties(self):
+        self.assertEqual(self._ids({'q': 'python'}), [str(self.trusted.id), str(self.plain.id)])
+
+    def test_without_query_orders_by_quality(self):
+        self.assertEqual(self._ids({})[0], str(self.trusted.id))
+
+    def test_static_relevance_is_stored(self):
+        documents = ProfileSearchDocument.objects.in_bulk([self.plain.pk, self.trusted.pk])
+        self.assertEqual(documents[self.plain.pk].static_relevance, 0)
+        # rating 5/5 + reviews 40/50 + verified 100% + premium at half weight
+        self.assertEqual(documents[self.trusted.pk].static_relevance, 3.3)
+
+    def test_weights_are_configurable(self):
+        with self.settings(SEARCH_RELEVANCE_WEIGHTS={'rating': 0, 'reviews': 0, 'verification': 0, 'subscription': 0}):
+            # Static weights are baked into the search documents
+            call_command('rebuild_search_documents', stdout=io.StringIO())
+            ids = self._ids({'page_size': 3})
+        # All scores tie at 0, so the id tie-break decides
+        self.assertEqual(ids, sorted(ids))
+
+    def test_rebuild_backfills_verification_percentage(self):
+        # Rows written before the percentage was stored still hold 0
+        User.objects.filter(pk=self.trusted.pk).update(verification_percentage=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_search_documents', stdout=io.StringIO())
+        self.trusted.refresh_from_db()
+        self.assertEqual(self.trusted.verification_percentage, 100)
+
+    def test_rebuild_backfills_review_stats(self):
+        Review.objects.create(user=self.plain, reviewer_name='Client', rating=4, comment='Good')
+        # Rows written before review_count was stored still hold 0
+        User.objects.filter(pk=self.plain.pk).update(rating=0, review_count=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_search_documents', stdout=io.StringIO())
+        self.plain.refresh_from_db()
+        self.assertEqual((self.plain.rating, self.plain.review_count), (4, 1))
+        self.assertGreater(ProfileSearchDocument.objects.get(user=self.plain).static_relevance, 0)
+
+    def test_relevance_cursor_pages_cover_all_rows(self):
+        first = self.client.get('/api/search-profiles/', {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        ids = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_profiles_without_search_document_are_paged_last(self):
+        missing = User.objects.create_user(email='new@example.com', username='new', password='testpass123')
+        ids = []
+        response = self.client.get('/api/search-profiles/', {'page_size': 1})
+        while True:
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(ids[-1], str(missing.id))
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import os
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from api.models import MediaBlob, Project
+from api.test_images import jpeg_upload
+from api.testing import TemporaryMediaRootMixin, VIDEO
+
+User = get_user_model()
+
+DIGEST = hashlib.sha256(VIDEO).hexdigest()
+
+
+class ContentAddressedStorageTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user(email='alice@example.com', username='alice', password='testpass123')
+        self.bob = User.objects.create_user(email='bob@example.com', username='bob', password='testpass123')
+
+    def _set_video(self, user, data=VIDEO, filename='intro.mp4'):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.video_intro = SimpleUploadedFile(filename, data)
+            user.save()
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_stored_under_content_digest(self):
+        self._set_video(self.alice)
+        self.assertEqual(self.alice.video_intro.name, f'videos/{DIGEST[:2]}/{DIGEST}.mp4')
+        with self.alice.video_intro.open('rb') as stored:
+            self.assertEqual(stored.read(), VIDEO)
+
+    def test_identical_uploads_share_one_file(self):
+        self._set_video(self.alice)
+        self._set_video(self.bob, filename='other-name.MP4')
+        self.assertEqual(self.alice.video_intro.name, self.bob.video_intro.name)
+        self.assertEqual(MediaBlob.objects.get(name=self.alice.video_intro.name).ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'videos', DIGEST[:2]))), 1)
+
+    def test_file_removed_with_last_reference(self):
+        self._set_video(self.alice)
+        self._set_video(self.bob)
+        name = self.alice.video_intro.name
+
+        self._set_video(self.alice, data=b'a different video')
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(self._exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(self._exists(name))
+
+    def test_saves_without_file_changes_keep_references(self):
+        self._set_video(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.bio = 'Editor'
+            self.alice.save()
+            User.objects.get(pk=self.alice.pk).save(update_fields=['bio'])
+        self.assertEqual(MediaBlob.objects.get(name=self.alice.video_intro.name).ref_count, 1)
+
+    def test_processed_image_releases_upload_and_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(user=self.alice, project_title='Site', project_image=jpeg_upload('a.jpg'))
+        project.refresh_from_db()
+        first_variants = project.project_image_variants
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.project_image = jpeg_upload('b.jpg', size=(1200, 900))
+            project.save()
+        project.refresh_from_db()
+
+        live = {project.project_image.name}
+        for size in project.project_image_variants['sizes'].values():
+            live.update((size['name'], size['webp']))
+        self.assertEqual(set(MediaBlob.objects.values_list('name', flat=True)), live)
+        self.assertFalse(self._exists(first_variants['sizes']['medium']['webp']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class MigrateMediaStorageTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'videos'))
+        for name in ('videos/a.mp4', 'videos/b.mp4'):
+            with open(os.path.join(self.media_root, name), 'wb') as legacy:
+                legacy.write(VIDEO)
+
+        self.alice = User.objects.create_user(email='alice@example.com', username='alice', password='testpass123')
+        self.bob = User.objects.create_user(email='bob@example.com', username='bob', password='testpass123')
+        User.objects.filter(pk=self.alice.pk).update(video_intro='videos/a.mp4')
+        User.objects.filter(pk=self.bob.pk).update(video_intro='videos/b.mp4')
+
+    def test_migrates_and_deduplicates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('migrate_media_storage', stdout=io.StringIO())
+
+        expected = f'videos/{DIGEST[:2]}/{DIGEST}.mp4'
+        self.assertEqual(User.objects.get(pk=self.alice.pk).video_intro.name, expected)
+        self.assertEqual(User.objects.get(pk=self.bob.pk).video_intro.name, expected)
+        self.assertEqual(MediaBlob.objects.get(name=expected).ref_count, 2)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'videos/a.mp4')))
+
+    def test_dry_run_changes_nothing(self):
+        output = io.StringIO()
+        call_command('migrate_media_storage', '--dry-run', stdout=output)
+        self.assertIn('Users: 2 rows would be migrated', output.getvalue())
+        self.assertEqual(User.objects.get(pk=self.alice.pk).video_intro.name, 'videos/a.mp4')
+        self.assertFalse(MediaBlob.objects.exists())
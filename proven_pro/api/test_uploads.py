@@ -0,0 +1,117 @@
+import hashlib
+import os
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from api import uploads
+from api.models import ChunkedUpload
+from api.testing import TemporaryMediaRootMixin, VIDEO
+
+User = get_user_model()
+
+
+@override_settings(CHUNKED_UPLOAD_MAX_CHUNK_SIZE=4096)
+class ChunkedVideoUploadTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='video@example.com', username='video', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def _start(self, size=len(VIDEO)):
+        return self.client.post('/api/uploads/video/', {'filename': 'intro.mp4', 'size': size}, format='json')
+
+    def _chunk(self, upload_id, offset, data):
+        return self.client.patch(
+            f'/api/uploads/video/{upload_id}/', data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def _send_all(self, upload_id):
+        for offset in range(0, len(VIDEO), 4096):
+            response = self._chunk(upload_id, offset, VIDEO[offset:offset + 4096])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def _complete(self, upload_id, checksum=None):
+        return self.client.post(
+            f'/api/uploads/video/{upload_id}/complete/',
+            {'checksum': checksum or hashlib.sha256(VIDEO).hexdigest()}, format='json',
+        )
+
+    def test_upload_in_chunks_and_attach(self):
+        upload_id = self._start().data['id']
+        self._send_all(upload_id)
+
+        response = self._complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        with self.user.video_intro.open('rb') as video:
+            self.assertEqual(video.read(), VIDEO)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).status, 'complete')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'chunked_uploads', f'{upload_id}.part')))
+
+    def test_resume_from_reported_offset(self):
+        upload_id = self._start().data['id']
+        self._chunk(upload_id, 0, VIDEO[:4096])
+
+        # A retried chunk that already arrived is rejected with the offset to resume from
+        conflict = self._chunk(upload_id, 0, VIDEO[:4096])
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(conflict['Upload-Offset'], '4096')
+
+        offset = int(self.client.get(f'/api/uploads/video/{upload_id}/')['Upload-Offset'])
+        for start in range(offset, len(VIDEO), 4096):
+            self._chunk(upload_id, start, VIDEO[start:start + 4096])
+        self.assertEqual(self._complete(upload_id).status_code, status.HTTP_200_OK)
+
+    def test_file_is_hashed_before_the_row_is_locked(self):
+        upload_id = self._start().data['id']
+        self._send_all(upload_id)
+
+        calls = mock.Mock()
+        with mock.patch('api.uploads.get_upload', side_effect=uploads.get_upload) as get_upload, \
+                mock.patch('api.uploads.file_sha256', side_effect=uploads.file_sha256) as file_sha256:
+            calls.attach_mock(get_upload, 'get_upload')
+            calls.attach_mock(file_sha256, 'file_sha256')
+            self.assertEqual(self._complete(upload_id).status_code, status.HTTP_200_OK)
+
+        names = [(name, kwargs.get('lock', False)) for name, args, kwargs in calls.mock_calls]
+        self.assertLess(names.index(('file_sha256', False)), names.index(('get_upload', True)))
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        upload_id = self._start().data['id']
+        self._chunk(upload_id, 0, VIDEO[:4096])
+        self.assertEqual(self._complete(upload_id).status_code, status.HTTP_409_CONFLICT)
+
+    def test_checksum_mismatch_discards_the_upload(self):
+        upload_id = self._start().data['id']
+        self._send_all(upload_id)
+        response = self._complete(upload_id, checksum='0' * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload_id).exists())
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.video_intro)
+
+    def test_limits(self):
+        self.assertEqual(self._start(size=0).status_code, status.HTTP_400_BAD_REQUEST)
+        upload_id = self._start().data['id']
+        self.assertEqual(
+            self._chunk(upload_id, 0, VIDEO[:5000]).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_only_video_files_are_accepted(self):
+        for filename in ('intro.html', 'intro.svg', 'intro'):
+            response = self.client.post('/api/uploads/video/', {'filename': filename, 'size': 100}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/uploads/video/', {'filename': 'Intro.MOV', 'size': 100}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_uploads_are_private(self):
+        upload_id = self._start().data['id']
+        other = User.objects.create_user(email='other@example.com', username='other', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self._chunk(upload_id, 0, VIDEO[:4096]).status_code, status.HTTP_404_NOT_FOUND)
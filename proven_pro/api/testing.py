@@ -0,0 +1,31 @@
+"""
+Fixtures shared by the media tests (uploads, images, storage, serving, GC).
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+VIDEO = bytes(range(256)) * 40  # 10 KiB
+
+
+class TemporaryMediaRootMixin:
+    """
+    Give each test an empty MEDIA_ROOT, with the directories derived from it
+    (chunked uploads, quarantine, GC checkpoint) underneath, and process
+    images inline. Other settings go on the class with @override_settings.
+    """
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CHUNKED_UPLOAD_ROOT=os.path.join(self.media_root, 'chunked_uploads'),
+            MEDIA_QUARANTINE_ROOT=os.path.join(self.media_root, '.quarantine'),
+            MEDIA_GC_CHECKPOINT=os.path.join(self.media_root, '.media-gc-checkpoint.json'),
+            IMAGE_PIPELINE_WORKERS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
@@ -0,0 +1,265 @@
+"""
+Resumable chunked uploads for Users.video_intro.
+
+    POST  /api/uploads/video/                      {"filename", "size"} -> upload state
+    GET   /api/uploads/video/<id>/                 upload state; resume from its offset
+    PATCH /api/uploads/video/<id>/                 raw chunk bytes, Upload-Offset: <current offset>
+    POST  /api/uploads/video/<id>/complete/        {"checksum": "<sha256 hex>"} -> attaches video_intro
+
+Every chunk is its own short request, streamed block by block into a part
+file, so no worker is held for the length of the whole upload, nothing
+buffers the full video, and a dropped connection only loses the current chunk.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import ChunkedUpload
+
+Users = get_user_model()
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_ROOT, f'{upload.pk}.part')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(READ_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remove_part(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PartFile(File):
+    """
+    A finished part file. FileSystemStorage moves files that expose
+    temporary_file_path() into place instead of copying them, and
+    ContentAddressedStorage reuses the verified checksum instead of hashing
+    the file again.
+    """
+    def __init__(self, file, sha256=None):
+        super().__init__(file)
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response({
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+    }, status=status_code)
+    response['Upload-Offset'] = str(upload.offset)
+    return response
+
+
+def check_chunk(upload, offset, length):
+    """
+    An error response if `length` bytes can't be appended at `offset` now, else None.
+    """
+    if upload.status != 'uploading':
+        return Response({'error': 'Upload already finalized'}, status=status.HTTP_409_CONFLICT)
+    if offset != upload.offset:
+        # e.g. a retried chunk that had already arrived; the client resumes from upload.offset
+        return upload_response(upload, status.HTTP_409_CONFLICT)
+    if offset + length > upload.size:
+        return Response({'error': 'Chunk runs past the declared size'}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def check_complete(upload):
+    """
+    An error response if the upload can't be finalized now, else None.
+    """
+    if upload.status != 'uploading':
+        return Response({'error': 'Upload already finalized'}, status=status.HTTP_409_CONFLICT)
+    if upload.offset != upload.size:
+        return Response(
+            {'error': 'Upload incomplete', 'offset': upload.offset, 'size': upload.size},
+            status=status.HTTP_409_CONFLICT
+        )
+    return None
+
+
+def get_upload(request, upload_id, lock=False):
+    uploads = ChunkedUpload.objects.filter(user=request.user)
+    if lock:
+        uploads = uploads.select_for_update()
+    return get_object_or_404(uploads, pk=upload_id)
+
+
+class VideoUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Start an upload of `size` bytes
+        """
+        filename = os.path.basename(str(request.data.get('filename', '')).strip())
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({'error': 'size must be a number of bytes'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not filename:
+            return Response({'error': 'filename is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if os.path.splitext(filename)[1].lower() not in settings.VIDEO_INTRO_EXTENSIONS:
+            return Response(
+                {'error': f"filename must end in one of {', '.join(settings.VIDEO_INTRO_EXTENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 < size <= settings.VIDEO_INTRO_MAX_SIZE:
+            return Response(
+                {'error': f'size must be between 1 and {settings.VIDEO_INTRO_MAX_SIZE} bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        upload = ChunkedUpload.objects.create(user=request.user, filename=filename, size=size)
+        os.makedirs(settings.CHUNKED_UPLOAD_ROOT, exist_ok=True)
+        open(part_path(upload), 'wb').close()
+        return upload_response(upload, status.HTTP_201_CREATED)
+
+
+class VideoUploadChunkView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        return upload_response(get_upload(request, upload_id))
+
+    def patch(self, request, upload_id):
+        """
+        Append the request body at Upload-Offset, which must be the current offset
+        """
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 0 < length <= settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {'error': f'Chunks must be between 1 and {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        upload = get_upload(request, upload_id)
+        rejected = check_chunk(upload, offset, length)
+        if rejected is not None:
+            return rejected
+
+        # Read the body before taking the row lock, so a slow client never
+        # holds a transaction open; the chunk is spooled to an unnamed file
+        with tempfile.TemporaryFile(dir=settings.CHUNKED_UPLOAD_ROOT) as chunk:
+            received = 0
+            while received < length:
+                block = request.stream.read(min(READ_BLOCK_SIZE, length - received))
+                if not block:
+                    break  # client went away; keep what arrived, it resumes from there
+                chunk.write(block)
+                received += len(block)
+            if not received:
+                return upload_response(upload)
+
+            # The row lock serializes chunks of one upload, and now only covers
+            # a local copy: check the offset again, append, advance
+            with transaction.atomic():
+                upload = get_upload(request, upload_id, lock=True)
+                rejected = check_chunk(upload, offset, received)
+                if rejected is not None:
+                    return rejected
+
+                chunk.seek(0)
+                with open(part_path(upload), 'r+b') as part:
+                    # Drop anything a failed append left past the offset
+                    part.seek(offset)
+                    part.truncate()
+                    shutil.copyfileobj(chunk, part, READ_BLOCK_SIZE)
+
+                upload.offset = offset + received
+                upload.save(update_fields=['offset', 'updated_at'])
+
+        return upload_response(upload)
+
+
+class VideoUploadCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        """
+        Verify the checksum and attach the finished file to video_intro
+        """
+        checksum = str(request.data.get('checksum', '')).strip().lower()
+        if not checksum:
+            return Response({'error': 'checksum (sha256 hex) is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = get_upload(request, upload_id)
+        rejected = check_complete(upload)
+        if rejected is not None:
+            return rejected
+
+        # Hash before taking the row lock: once offset reaches size no chunk
+        # can be appended, so the part file can only be finalized or removed
+        # by another completion, which the re-check under the lock catches
+        path = part_path(upload)
+        try:
+            matches = file_sha256(path) == checksum
+        except FileNotFoundError:
+            matches = False
+
+        with transaction.atomic():
+            upload = get_upload(request, upload_id, lock=True)
+            rejected = check_complete(upload)
+            if rejected is not None:
+                return rejected
+
+            if not matches:
+                # The bytes on disk are not what the client sent; it has to start over
+                upload.delete()
+                transaction.on_commit(lambda: remove_part(path))
+                return Response(
+                    {'error': 'Checksum mismatch, start a new upload'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # The profile switches to the new video in one UPDATE, only once
+            # the whole file is in storage
+            user = Users.objects.select_for_update().get(pk=request.user.pk)
+            with open(path, 'rb') as part:
+                user.video_intro.save(upload.filename, PartFile(part, sha256=checksum), save=False)
+            user.save(update_fields=['video_intro'])
+
+            upload.status = 'complete'
+            upload.save(update_fields=['status', 'updated_at'])
+            # Storages that copy rather than move leave the part file behind
+            transaction.on_commit(lambda: remove_part(path))
+
+        return Response({
+            'message': 'Video uploaded successfully',
+            'video_intro_url': user.video_intro.url,
+        })
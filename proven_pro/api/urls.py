@@ -1,6 +1,4 @@
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from .auth_user import (
     RegisterViewSet, LoginView, google_auth, RequestResetPasswordView, 
@@ -10,10 +8,13 @@ from .subscription import(
     SubscriptionCheckView,
     UpdateSubscriptionView,CreateGCashPaymentView,VerifyPaymentView,PayMongoWebhookView,GCashWebhookView)
 
+from .uploads import VideoUploadView, VideoUploadChunkView, VideoUploadCompleteView
 from .views import ( 
     UserProfileView,
     generate_profile_share,
     verify_profile_share,
+    public_profile_by_slug,
+    public_profiles_batch,
     submit_review,
     get_reviews,
     UploadVerificationDocumentView,
@@ -22,6 +23,7 @@ from .views import (
     GetVerificationStatusView,
     admin_document_approval_webhook,
     UserSearchFilterView,
+    search_suggestions,
     health_check,
     CheckProfileStatusView, 
 )
@@ -49,7 +51,15 @@ urlpatterns = [
     path('submit-review/<uuid:token>/', submit_review, name='submit-review'),
     path('get_reviews/', get_reviews, name='get_reviews'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
+    path('p/<str:slug>/', public_profile_by_slug, name='public-profile'),
+    path('profiles/batch/', public_profiles_batch, name='public-profiles-batch'),
     path('search-profiles/', UserSearchFilterView.as_view(), name='search-profiles'),
+    path('search-suggestions/', search_suggestions, name='search-suggestions'),
+
+    # Resumable video_intro uploads
+    path('uploads/video/', VideoUploadView.as_view(), name='video-upload'),
+    path('uploads/video/<uuid:upload_id>/', VideoUploadChunkView.as_view(), name='video-upload-chunk'),
+    path('uploads/video/<uuid:upload_id>/complete/', VideoUploadCompleteView.as_view(), name='video-upload-complete'),
 
     # Updated subscription endpoints
     path('update-subscription/', UpdateSubscriptionView.as_view(), name='update-subscription'),
@@ -69,7 +79,3 @@ urlpatterns = [
     path('verification-status/', GetVerificationStatusView.as_view(), name='verification-status'),
     path('admin/document-approval-webhook/', admin_document_approval_webhook, name='admin-document-approval-webhook'),
 ]
-
-# Add this at the end to serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,13 @@
+from django.db import connection
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE in one statement per batch.
+    MySQL doesn't accept a conflict target, so unique_fields is only passed to
+    backends that support it.
+    """
+    kwargs = {'update_conflicts': True, 'update_fields': update_fields, 'batch_size': batch_size}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+    return model.objects.bulk_create(objs, **kwargs)
@@ -4,14 +4,30 @@ from rest_framework import permissions, status
 from rest_framework import viewsets, permissions, status
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.decorators import api_view, permission_classes
-from .serializers import UserProfileSerializer, ReviewSerializer, PublicProfileSerializer
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from .serializers import (
+    UserProfileSerializer, ReviewSerializer, PublicProfileSerializer, AnonymousProfileSerializer, SearchCardSerializer,
+)
 import json , os
 from .models import Review, ProfileShare
+from .search import (
+    search_candidates, cached_facet_counts, normalize_search_params, search_cache_key, rank_candidates,
+    RESULT_PARAMS,
+)
+from .pagination import KeysetPagination
+from .autocomplete import suggest
+from .skills import users_with_skills
+from .profiles import (
+    conditional_profile_response, set_profile_validators, set_edge_cache_headers, profile_json, profiles_json,
+    profile_variant, render_json,
+)
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 import uuid
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from decimal import Decimal, InvalidOperation
+from rest_framework.parsers import MultiPartParser, FormParser
+from .renderers import ORJSONParser
 from django.core.mail import send_mail
 import requests
 from django.views.decorators.csrf import csrf_exempt
@@ -19,8 +35,9 @@ from django.core.mail import EmailMultiAlternatives
 import logging
 # from twilio.rest import Client
 import random
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import F, Q, prefetch_related_objects
+from django.http import HttpResponse, JsonResponse
 from django.template.loader import render_to_string
 from django.core.mail import EmailMessage
 
@@ -39,17 +56,25 @@ with open(json_file_path) as file:
     URL_FIELDS = profile_fields["URL_FIELDS"] 
 
 class UserProfileView(APIView):
-    parser_classes = (MultiPartParser, FormParser, JSONParser)
+    parser_classes = (MultiPartParser, FormParser, ORJSONParser)
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Serialize the user with all related data
-        serializer = UserProfileSerializer(user)
-        
-        # Return the complete serialized data without filtering
-        return Response(serializer.data)
+        # ?fields= / ?expand= narrow the payload; unrequested relations aren't loaded
+        fields, expand = UserProfileSerializer.parse_selection(request.query_params)
+        variant = profile_variant('owner', fields, expand)
+
+        # Clients holding the current version get a 304 before anything is loaded
+        not_modified = conditional_profile_response(request, request.user, variant)
+        if not_modified is not None:
+            return not_modified
+
+        # Pre-rendered JSON from cache; on a miss request.user (already loaded by
+        # authentication) gets one ordered prefetch per rendered relation (see api/profiles.py)
+        body = profile_json(request.user, 'owner', fields, expand)
+        response = HttpResponse(body, content_type='application/json')
+        response['Cache-Control'] = 'private, no-cache'
+        return set_profile_validators(response, request.user, variant)
 
     def post(self, request):
         user = request.user
@@ -95,16 +120,10 @@ class UserProfileView(APIView):
         serializer = UserProfileSerializer(user, data=data, partial=True)
         
         if serializer.is_valid():
-            # Save the data fields
-            instance = serializer.save()
-            
-            # Handle file fields separately
-            for key, file in files.items():
-                setattr(instance, key, file)
-            
-            # Save again if there were files
-            if files:
-                instance.save()
+            # Files ride along with the validated data, so the whole edit is one
+            # transaction with a single user save that writes only changed columns
+            with transaction.atomic():
+                serializer.save(**{key: file for key, file in files.items() if key in serializer.fields})
             
             return Response({
                 'message': 'Profile updated successfully',
@@ -119,7 +138,8 @@ class UserProfileView(APIView):
         user = request.user
         serializer = UserProfileSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
@@ -128,42 +148,119 @@ class UserSearchFilterView(APIView):
     permission_classes = [AllowAny]  # Change to IsAuthenticated if needed
 
     def get(self, request):
-        query = request.GET.get('q', '')
+        cache_key = search_cache_key('results', normalize_search_params(request.GET, RESULT_PARAMS))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return Response(cached)
+
+        query = normalize_search_params(request.GET).get('q')
         job_title = request.GET.get('job_title')
         specialization = request.GET.get('job_specialization')
         language = request.GET.get('language')
         sort_by = request.GET.get('sort_by')  # e.g., 'rating' or 'first_name'
 
-        users = Users.objects.all()
+        fields, expand = SearchCardSerializer.parse_selection(request.GET)
 
-        # Filtering
+        users = Users.objects.only(*SearchCardSerializer.COLUMNS)
+
+        # Filtering: free text goes through the inverted index instead of LIKE scans
+        scores = ranked = None
+        truncated = False
         if query:
-            users = users.filter(
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(bio__icontains=query) |
-                Q(skills__icontains=query) |
-                Q(services__icontains=query)
-            )
+            # A stop-word-only query (NO_TERMS_QUERY) has no terms and matches nobody
+            matches, truncated = search_candidates(query)
+            scores = dict(matches)
+            users = users.filter(id__in=list(scores))
 
+        # Structured filters read the denormalized search document, not five joined tables
         if job_title:
-            users = users.filter(job_title__icontains=job_title)
+            users = users.filter(search_document__positions__icontains=job_title)
 
         if specialization:
-            users = users.filter(job_specialization__icontains=specialization)
+            users = users.filter(search_document__categories__icontains=specialization)
 
         if language:
-            users = users.filter(languages__icontains=language)
+            users = users.filter(search_document__skills__icontains=language)
+
+        # Exact skill matches through the normalized taxonomy; all skills by default
+        skills = [name for name in request.GET.get('skills', '').split(',') if name.strip()]
+        if skills:
+            match_all = request.GET.get('skills_match', 'all') != 'any'
+            users = users.filter(id__in=users_with_skills(skills, match_all=match_all))
+
+        # Price range: profiles whose [rate_min, rate_max] overlaps the requested range
+        try:
+            rate_min = Decimal(request.GET['rate_min']) if request.GET.get('rate_min') else None
+            rate_max = Decimal(request.GET['rate_max']) if request.GET.get('rate_max') else None
+        except InvalidOperation:
+            return Response({'error': 'rate_min and rate_max must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if rate_min is not None:
+            users = users.filter(search_document__rate_max__gte=rate_min)
+
+        if rate_max is not None:
+            users = users.filter(search_document__rate_min__lte=rate_max)
 
-        # Sorting
+        if request.GET.get('currency'):
+            users = users.filter(search_document__rate_currency=request.GET['currency'].upper())
+
+        facets = cached_facet_counts(users, request.GET)
+
+        # Sorting: every ordering ends on 'id' so keyset cursors are stable
         if sort_by == 'rating':
-            users = users.order_by('-rating')  # highest rating first
+            ordering = ('-rating', '-id')  # highest rating first
         elif sort_by == 'first_name':
-            users = users.order_by('first_name')
+            ordering = ('first_name', 'id')
+        elif sort_by == 'rate':
+            # Cheapest first; profiles without a parseable rate can't be placed on the scale
+            ordering = ('rate_sort', 'id')
+            users = users.filter(search_document__rate_min__isnull=False).annotate(
+                rate_sort=F('search_document__rate_min')
+            )
+        else:
+            ordering = ('-relevance', 'id')
+            if scores is None:
+                # Static relevance is stored on the search document; an index scan serves the page
+                users = users.annotate(relevance=F('search_document__static_relevance'))
+            else:
+                # Text scores only exist for the (bounded) candidates: blend and sort those in Python
+                ranked = rank_candidates(users.values_list('id', 'search_document__static_relevance'), scores)
+
+        paginator = KeysetPagination(ordering)
+        if ranked is None:
+            page = paginator.paginate_queryset(users, request, view=self)
+        else:
+            page = paginator.paginate_queryset(ranked, request, view=self)
+            loaded = users.in_bulk([profile.id for profile in page])
+            page = [loaded[profile.id] for profile in page]
+
+        # Nested data is only loaded for the rows on this page: one query per expanded relation
+        relations = SearchCardSerializer.required_relations(fields, expand)
+        if relations:
+            prefetch_related_objects(page, *relations)
 
-        serializer = UserProfileSerializer(users, many=True)
-        return Response(serializer.data)
+        serializer = SearchCardSerializer(page, many=True, fields=fields, expand=expand)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['facets'] = facets
+        # Only the best SEARCH_MAX_CANDIDATES text matches are ranked, paged and counted
+        response.data['truncated'] = truncated
+        cache.set(cache_key, response.data, timeout=settings.SEARCH_RESULTS_CACHE_TIMEOUT)
+        return response
+
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_suggestions(request):
+    """
+    Typeahead for the search box: top names, skills and categories starting with ?q=
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.SEARCH_AUTOCOMPLETE_MAX_RESULTS))
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
 
+    return Response({'suggestions': suggest(request.GET.get('q', ''), limit)})
 
 
 @api_view(['GET'])
@@ -183,12 +280,22 @@ def verify_profile_share(request, token):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Serialize the profile data
-        serializer = PublicProfileSerializer(share.user)
-        return Response({
-            'profile': serializer.data,
-            'share_token': str(share.share_token)
-        })
+        fields, expand = PublicProfileSerializer.parse_selection(request.query_params)
+        variant = profile_variant('public', fields, expand)
+
+        not_modified = conditional_profile_response(request, share.user, variant)
+        if not_modified is not None:
+            return not_modified
+
+        # Splice the cached public profile JSON into the envelope rather than
+        # re-serializing it
+        body = b''.join([
+            b'{"profile":', profile_json(share.user, 'public', fields, expand),
+            b',"share_token":', render_json(str(share.share_token)), b'}',
+        ])
+        response = HttpResponse(body, content_type='application/json')
+        response['Cache-Control'] = 'private, no-cache'
+        return set_profile_validators(response, share.user, variant)
         
     except (ProfileShare.DoesNotExist, ValueError, TypeError):
         return Response(
@@ -196,6 +303,86 @@ def verify_profile_share(request, token):
             status=status.HTTP_404_NOT_FOUND
         )
 
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def public_profile_by_slug(request, slug):
+    """
+    Anonymous public profile at /api/p/<profile_url>/, built to sit behind a CDN:
+    no authentication (so nothing varies per caller), one indexed user lookup,
+    then the cached rendering. Profile writes drop it here and at the edge.
+    """
+    user = Users.objects.filter(profile_url=slug, is_active=True).first()
+    if user is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    fields, expand = AnonymousProfileSerializer.parse_selection(request.query_params)
+    variant = profile_variant('anonymous', fields, expand)
+
+    response = conditional_profile_response(request, user, variant)
+    if response is None:
+        response = HttpResponse(profile_json(user, 'anonymous', fields, expand), content_type='application/json')
+        set_profile_validators(response, user, variant)
+    return set_edge_cache_headers(response, user)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def public_profiles_batch(request):
+    """
+    Profiles for a list of user ids and/or profile_url slugs:
+    {"ids": [...], "profile_urls": [...]} -> {"results": [...], "missing": [...]}.
+    Results follow the request order; unknown identifiers are listed in "missing".
+    Without a share token nothing vouches for the caller, so these are the
+    anonymous representation: no contact details.
+    """
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Expected an object with ids and/or profile_urls'}, status=status.HTTP_400_BAD_REQUEST)
+    ids = request.data.get('ids') or []
+    slugs = request.data.get('profile_urls') or []
+    if not isinstance(ids, list) or not isinstance(slugs, list):
+        return Response({'error': 'ids and profile_urls must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(ids) + len(slugs) > settings.PROFILE_BATCH_MAX_SIZE:
+        return Response(
+            {'error': f'At most {settings.PROFILE_BATCH_MAX_SIZE} profiles per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        ids = [uuid.UUID(str(user_id)) for user_id in ids]
+    except ValueError:
+        return Response({'error': 'ids must be user UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
+    slugs = [str(slug) for slug in slugs]
+
+    fields, expand = AnonymousProfileSerializer.parse_selection(request.query_params)
+
+    # One query for every requested user, however they were identified
+    users = list(Users.objects.filter(Q(pk__in=ids) | Q(profile_url__in=slugs), is_active=True))
+    by_id = {user.pk: user for user in users}
+    by_slug = {user.profile_url: user for user in users}
+
+    bodies = profiles_json(users, 'anonymous', fields, expand)
+
+    results = []
+    missing = []
+    served = set()
+    requested = [(str(user_id), by_id.get(user_id)) for user_id in ids]
+    requested += [(slug, by_slug.get(slug)) for slug in slugs]
+    for identifier, user in requested:
+        if user is None:
+            missing.append(identifier)
+        elif user.pk not in served:
+            served.add(user.pk)
+            results.append(bodies[user.pk])
+
+    # Splice the cached renderings instead of re-serializing them
+    body = b''.join([
+        b'{"results":[', b','.join(results), b'],"missing":', render_json(missing), b'}',
+    ])
+    return HttpResponse(body, content_type='application/json')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_profile_share(request):
@@ -310,12 +497,15 @@ def get_reviews(request):
     # Get the current user
     user = request.user
     
-    # Get all reviews for this user
-    reviews = Review.objects.filter(user=user).order_by('-created_at')
-    
-    # Serialize and return the reviews
-    serializer = ReviewSerializer(reviews, many=True)
-    return Response(serializer.data)
+    # Newest first, one page at a time; served from the (user, created_at) index
+    reviews = Review.objects.filter(user=user)
+    paginator = KeysetPagination(('-created_at', '-id'))
+    page = paginator.paginate_queryset(reviews, request)
+
+    serializer = ReviewSerializer(page, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    response.data['summary'] = {'count': user.review_count, 'average': user.rating}
+    return response
 
 class CheckProfileStatusView(APIView):
     permission_classes = [IsAuthenticated]
@@ -59,7 +59,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
-    
+    # orjson-backed when orjson is installed, stock DRF JSON otherwise (see api/renderers.py).
+    # The first renderer is also used for the cached profile JSON, so keep a JSON renderer first.
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 MIDDLEWARE = [
@@ -119,10 +129,62 @@ DATABASES = {
     }
 }
 
+# Cache
+# LocMemCache is per-process; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache, redis://127.0.0.1:6379/1)
+# when running several workers so invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='proven-pro'),
+        'TIMEOUT': 60 * 5,
+    }
+}
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per distinct content and reference-counted (api/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'api.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Resumable video uploads (api/uploads.py). Part files are kept on the same
+# filesystem as MEDIA_ROOT so finalizing is a rename rather than a copy.
+CHUNKED_UPLOAD_ROOT = os.path.join(MEDIA_ROOT, 'chunked_uploads')
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+VIDEO_INTRO_MAX_SIZE = 500 * 1024 * 1024
+VIDEO_INTRO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.webm')
+
+# Media serving (api/media.py). With MEDIA_ACCEL_REDIRECT_PREFIX set (e.g.
+# /protected-media/, an nginx `internal` location aliased to MEDIA_ROOT),
+# Django only checks access and nginx sends the file.
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=60 * 60 * 24, cast=int)
+MEDIA_STAFF_ONLY_PREFIXES = ('verification/',)
+
+# collect_orphaned_media: unreferenced files modified within the grace period
+# are kept (uploads in flight, blobs just reused); --quarantine moves the rest
+# aside instead of deleting them.
+MEDIA_GC_GRACE_DAYS = config('MEDIA_GC_GRACE_DAYS', default=7, cast=int)
+MEDIA_QUARANTINE_ROOT = os.path.join(MEDIA_ROOT, '.quarantine')
+MEDIA_GC_CHECKPOINT = os.path.join(MEDIA_ROOT, '.media-gc-checkpoint.json')
+
+# Image derivatives (api/images.py): uploads are EXIF-stripped and downscaled to
+# IMAGE_MAX_DIMENSION, then resized into these variants (JPEG/PNG + WebP) in a
+# background thread pool. 0 workers processes inline, after the transaction commits.
+IMAGE_PIPELINE_WORKERS = config('IMAGE_PIPELINE_WORKERS', default=2, cast=int)
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_VARIANTS = {
+    'thumb': {'size': 96, 'crop': True},
+    'small': {'size': 320, 'crop': False},
+    'medium': {'size': 800, 'crop': False},
+}
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -224,3 +286,31 @@ TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
 
 
 
+
+# Profile search
+SEARCH_MAX_CANDIDATES = 1000  # upper bound on ranked hits pulled from the inverted index
+SEARCH_FACETS_CACHE_TIMEOUT = 60 * 5
+SEARCH_RESULTS_CACHE_TIMEOUT = 60 * 5
+SEARCH_AUTOCOMPLETE_MAX_RESULTS = 10  # hard cap on suggestions per response
+# Relevance blend used when search-profiles has no sort_by (see api/search.py);
+# run rebuild_search_documents after changing any weight but 'text'
+SEARCH_RELEVANCE_WEIGHTS = {
+    'text': 4.0,
+    'rating': 1.0,
+    'reviews': 1.0,
+    'verification': 1.0,
+    'subscription': 0.5,
+}
+
+# Profile responses
+PROFILE_JSON_CACHE_TIMEOUT = 60 * 60  # rendered profile JSON; also dropped on every profile write
+PROFILE_NESTED_WRITE_MAX_ITEMS = 50  # experiences / certifications / projects items per profile update
+PROFILE_BATCH_MAX_SIZE = config('PROFILE_BATCH_MAX_SIZE', default=200, cast=int)  # ids + slugs per profiles/batch/ request
+# Public profiles by slug (/api/p/<profile_url>/) are cacheable by browsers and a CDN
+PUBLIC_PROFILE_MAX_AGE = 60
+PUBLIC_PROFILE_SHARED_MAX_AGE = 60 * 10
+PUBLIC_PROFILE_STALE_WHILE_REVALIDATE = 60 * 60
+# Surrogate-key purge endpoint (e.g. https://api.fastly.com/service/<id>/purge); empty disables purging
+CDN_PURGE_URL = config('CDN_PURGE_URL', default='')
+CDN_PURGE_TOKEN = config('CDN_PURGE_TOKEN', default='')
+CDN_PURGE_WORKERS = config('CDN_PURGE_WORKERS', default=1, cast=int)  # purge threads; 0 purges inline